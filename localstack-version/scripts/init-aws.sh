@@ -16,19 +16,40 @@ aws dynamodb create-table \
   --billing-mode PAY_PER_REQUEST \
   --region us-east-1
 
-# 処理済みデータテーブル
+# 処理済みデータテーブル（ステータス・作成日時のGSI付き）
 aws dynamodb create-table \
   --endpoint-url http://localhost:4566 \
   --table-name local-processed-data \
-  --attribute-definitions AttributeName=id,AttributeType=S \
+  --attribute-definitions \
+    AttributeName=id,AttributeType=S \
+    AttributeName=status,AttributeType=S \
+    AttributeName=created_at,AttributeType=S \
   --key-schema AttributeName=id,KeyType=HASH \
+  --global-secondary-indexes \
+    'IndexName=status-created_at-index,KeySchema=[{AttributeName=status,KeyType=HASH},{AttributeName=created_at,KeyType=RANGE}],Projection={ProjectionType=ALL}' \
   --billing-mode PAY_PER_REQUEST \
   --region us-east-1
 
-# 通知テーブル
+# 通知テーブル（ステータス・宛先ごとの作成日時のGSI付き）
 aws dynamodb create-table \
   --endpoint-url http://localhost:4566 \
   --table-name local-notifications \
+  --attribute-definitions \
+    AttributeName=id,AttributeType=S \
+    AttributeName=status,AttributeType=S \
+    AttributeName=recipient,AttributeType=S \
+    AttributeName=created_at,AttributeType=S \
+  --key-schema AttributeName=id,KeyType=HASH \
+  --global-secondary-indexes \
+    'IndexName=status-created_at-index,KeySchema=[{AttributeName=status,KeyType=HASH},{AttributeName=created_at,KeyType=RANGE}],Projection={ProjectionType=ALL}' \
+    'IndexName=recipient-created_at-index,KeySchema=[{AttributeName=recipient,KeyType=HASH},{AttributeName=created_at,KeyType=RANGE}],Projection={ProjectionType=ALL}' \
+  --billing-mode PAY_PER_REQUEST \
+  --region us-east-1
+
+# ユーザー統計テーブル
+aws dynamodb create-table \
+  --endpoint-url http://localhost:4566 \
+  --table-name local-user-stats \
   --attribute-definitions AttributeName=id,AttributeType=S \
   --key-schema AttributeName=id,KeyType=HASH \
   --billing-mode PAY_PER_REQUEST \
@@ -40,6 +61,9 @@ aws s3 mb s3://lambda-cicd-local-data --endpoint-url http://localhost:4566
 echo "Creating SNS topic..."
 aws sns create-topic --name lambda-cicd-local-notifications --endpoint-url http://localhost:4566
 
+echo "Verifying SES sender..."
+aws ses verify-email-identity --email-address noreply@local.example.com --endpoint-url http://localhost:4566
+
 echo "LocalStack initialization completed!"
 
 # テーブルの確認
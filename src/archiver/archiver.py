@@ -0,0 +1,119 @@
+import os
+import uuid
+from collections import defaultdict
+
+from utils import log_event
+from db import deserialize_image
+from storage import S3OffloadPolicy, encode_lines, estimate_size, s3_client
+from memory import MemoryBudget, MemoryBudgetExceeded
+
+
+# 環境変数
+DATA_BUCKET_NAME = os.environ.get('DATA_BUCKET_NAME', '')
+ARCHIVE_PREFIX = 'archive/'
+# パーティションの推定サイズがこれを超えたら途中で書き出す（読み戻したペイロードを溜め込まない）
+PARTITION_MAX_BYTES = int(os.environ.get('ARCHIVE_PARTITION_MAX_BYTES', str(16 * 1024 * 1024)))
+
+# オフロード済みの属性を読み戻し、アーカイブ単体で完結させる（退避先は data_processor と同じ）
+offload_policy = S3OffloadPolicy(DATA_BUCKET_NAME, prefix='job-payloads/')
+memory_budget = MemoryBudget()
+
+
+@memory_budget.profile
+def lambda_handler(event, context):
+    """TTLで期限切れになったレコードをS3にアーカイブするハンドラー"""
+    log_event(event, context)
+
+    records = event.get('Records', [])
+    # テーブルと日付ごとにまとめ、1パーティション1オブジェクトで書き込む
+    partitions = defaultdict(list)
+    partition_bytes = defaultdict(int)
+    archived = 0
+    processed = 0
+
+    def flush():
+        nonlocal archived
+        archived += write_partitions(partitions)
+        partition_bytes.clear()
+
+    try:
+        # メモリが逼迫したら途中でS3に書き出してバッファを空にする
+        for record in memory_budget.iterate(records, on_pressure=flush):
+            processed += 1
+            if not is_ttl_removal(record):
+                continue
+            item = deserialize_image(record.get('dynamodb', {}).get('OldImage'))
+            if item is None:
+                continue
+            item = rehydrate(item)
+            partition = (table_name_from_arn(record['eventSourceARN']), partition_date(item))
+            partitions[partition].append(item)
+            partition_bytes[partition] += estimate_size(item)
+            if partition_bytes[partition] >= PARTITION_MAX_BYTES:
+                archived += write_partitions({partition: partitions.pop(partition)})
+                del partition_bytes[partition]
+    except MemoryBudgetExceeded as e:
+        print(f"Stopping batch early: {str(e)}")
+
+    flush()
+
+    response = {'statusCode': 200, 'body': f'Archived {archived} records'}
+    if processed < len(records):
+        # 未処理のレコードだけを再試行させる（ReportBatchItemFailures）
+        response['batchItemFailures'] = [
+            {'itemIdentifier': records[processed]['dynamodb']['SequenceNumber']}
+        ]
+    return response
+
+
+def write_partitions(partitions):
+    """パーティションごとにS3へ書き込み、書き込んだ件数を返す"""
+    written = 0
+    for (table_name, date), items in partitions.items():
+        year, month, day = date.split('-')
+        key = (
+            f"{ARCHIVE_PREFIX}{table_name}/year={year}/month={month}/day={day}/"
+            f"{uuid.uuid4()}.jsonl.gz"
+        )
+        s3_client.put_object(
+            Bucket=DATA_BUCKET_NAME,
+            Key=key,
+            Body=encode_lines(items),
+            ContentType='application/x-ndjson',
+            ContentEncoding='gzip'
+        )
+        print(f"Archived {len(items)} records to s3://{DATA_BUCKET_NAME}/{key}")
+        written += len(items)
+
+    partitions.clear()
+    return written
+
+
+def rehydrate(item):
+    """S3に退避された属性を読み戻す（読めない・復元できない場合はポインタのまま残す）"""
+    try:
+        return offload_policy.rehydrate(item)
+    except Exception as e:
+        # 1件の壊れたペイロードでバッチ全体を失敗させない
+        print(f"Failed to rehydrate {item.get('id', 'unknown')}: {type(e).__name__}: {str(e)}")
+        return item
+
+
+def is_ttl_removal(record):
+    """TTLによる削除（DynamoDBサービスによるREMOVE）かどうか"""
+    identity = record.get('userIdentity') or {}
+    if record.get('eventName') != 'REMOVE':
+        return False
+    return identity.get('type') == 'Service' and identity.get('principalId') == 'dynamodb.amazonaws.com'
+
+
+def table_name_from_arn(stream_arn):
+    """ストリームARNからテーブル名を取得"""
+    # arn:aws:dynamodb:region:account:table/{name}/stream/{label}
+    return stream_arn.split(':table/', 1)[1].split('/', 1)[0]
+
+
+def partition_date(item):
+    """作成日（YYYY-MM-DD）でパーティションを決める"""
+    created_at = str(item.get('created_at') or '')
+    return created_at[:10] if len(created_at) >= 10 else '1970-01-01'
@@ -1,24 +1,85 @@
 import os
+import re
+import math
+import uuid
+from urllib.parse import unquote_plus
+
 import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
 
 from utils import (
     create_response,
     log_event,
     parse_json_body,
-    get_current_timestamp
+    get_path_parameter,
+    get_query_parameter,
+    get_current_timestamp,
+    get_time_range,
+    get_limit,
+    encode_next_token,
+    decode_next_token
+)
+from db import (
+    DynamoDBManager,
+    BufferedWriter,
+    BatchWriteError,
+    is_validation_error,
+    UpdateExpressionBuilder,
+    TTL_ATTRIBUTE,
+    expires_at,
+    time_range_condition
 )
-from db import DynamoDBManager
+from storage import S3OffloadPolicy
+from warmup import warmup_handler
+from router import Router, timed, require_fields
 
 
 # 環境変数
 ENVIRONMENT = os.environ.get('ENVIRONMENT', 'dev')
-PROCESSING_TABLE_NAME = f"{ENVIRONMENT}-processing-jobs"
+PROCESSING_TABLE_NAME = f"{ENVIRONMENT}-processed-data"
+STATUS_INDEX_NAME = 'status-created_at-index'
+DATA_BUCKET_NAME = os.environ.get('DATA_BUCKET_NAME', '')
+# ジョブの保持日数（expires_at によるTTL、0で無期限）
+RETENTION_DAYS = int(os.environ.get('RETENTION_DAYS', '30'))
+OFFLOAD_THRESHOLD_BYTES = int(os.environ.get('OFFLOAD_THRESHOLD_BYTES', str(32 * 1024)))
+
+# アップロード設定
+UPLOAD_PREFIX = 'uploads/'
+UPLOAD_URL_EXPIRES_SECONDS = int(os.environ.get('UPLOAD_URL_EXPIRES_SECONDS', '900'))
+MULTIPART_THRESHOLD_BYTES = int(os.environ.get('MULTIPART_THRESHOLD_BYTES', str(100 * 1024 * 1024)))
+MULTIPART_PART_SIZE_BYTES = int(os.environ.get('MULTIPART_PART_SIZE_BYTES', str(64 * 1024 * 1024)))
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', str(50 * 1024 * 1024 * 1024)))
+# S3のマルチパートアップロードのパート数上限
+MAX_UPLOAD_PARTS = 10000
+
+# uploads/{job_id}/{filename} 形式のキーからジョブIDを取り出す
+UPLOAD_KEY_PATTERN = re.compile(r'^uploads/([0-9a-f-]{36})/')
 
 # AWS クライアント
-s3_client = boto3.client('s3')
-db_manager = DynamoDBManager(PROCESSING_TABLE_NAME)
+# 署名付きURLはSigV4で発行する
+s3_client = boto3.client('s3', config=Config(signature_version='s3v4'))
+
+# data / metadata / result が大きい場合はS3に退避し、ジョブにはポインタだけを残す
+# （uploads/ 以外のプレフィックスを使い、S3トリガーが発火しないようにする）
+offload_policy = S3OffloadPolicy(
+    DATA_BUCKET_NAME,
+    prefix='job-payloads/',
+    threshold_bytes=OFFLOAD_THRESHOLD_BYTES
+) if DATA_BUCKET_NAME else None
+db_manager = DynamoDBManager(PROCESSING_TABLE_NAME, offload=offload_policy, ttl_days=RETENTION_DAYS)
+
+# S3処理ジョブの記録はハンドラー終了時にまとめて書き込む
+job_writer = BufferedWriter(PROCESSING_TABLE_NAME, ttl_days=RETENTION_DAYS)
 
+# ルーティングテーブル（import時に一度だけ構築）
+router = Router(middleware=[timed])
 
+
+@warmup_handler(
+    db_managers=[db_manager],
+    probes={'s3': lambda: s3_client.head_bucket(Bucket=DATA_BUCKET_NAME)} if DATA_BUCKET_NAME else None
+)
 def lambda_handler(event, context):
     """データ処理のメインハンドラー"""
     log_event(event, context)
@@ -30,11 +91,15 @@ def lambda_handler(event, context):
             return handle_s3_event(event, context)
         elif 'httpMethod' in event:
             # API Gatewayイベント
-            return handle_api_request(event, context)
+            return router.dispatch(event, context)
         else:
             print("Unknown event type")
             return {'statusCode': 400, 'body': 'Unknown event type'}
 
+    except BatchWriteError:
+        # ジョブを記録できなかった場合はLambdaに再試行させる
+        raise
+
     except Exception as e:
         print(f"Error in lambda_handler: {str(e)}")
         return create_response(500, {'error': 'Internal server error'})
@@ -44,55 +109,92 @@ def handle_s3_event(event, context):
     """S3イベントを処理"""
     try:
         for record in event['Records']:
-            # S3イベント情報を取得
-            s3_info = record['s3']
-            bucket_name = s3_info['bucket']['name']
-            object_key = s3_info['object']['key']
-            event_name = record['eventName']
-
-            print(f"Processing S3 event: {event_name} for {bucket_name}/{object_key}")
-
-            # 処理ジョブを記録
-            job = {
-                'id': context.request_id,
-                'type': 's3_processing',
-                'bucket': bucket_name,
-                'key': object_key,
-                'status': 'processing',
-                'created_at': get_current_timestamp(),
-                'event_name': event_name
-            }
+            process_s3_record(record, context)
 
-            db_manager.put_item(job)
+        return {'statusCode': 200, 'body': 'S3 event processed successfully'}
 
-            # ファイルサイズを取得
-            response = s3_client.head_object(Bucket=bucket_name, Key=object_key)
-            file_size = response['ContentLength']
-            content_type = response.get('ContentType', 'unknown')
+    finally:
+        job_writer.flush(raise_on_failure=True)
 
-            # 処理完了を記録
-            updates = {
-                'status': 'completed',
-                'completed_at': get_current_timestamp(),
-                'file_size': file_size,
-                'content_type': content_type
-            }
 
-            db_manager.update_item({'id': context.request_id}, updates)
+def process_s3_record(record, context):
+    """S3イベントの1レコードを処理してジョブを記録"""
+    # S3イベント情報を取得
+    s3_info = record['s3']
+    bucket_name = s3_info['bucket']['name']
+    # イベント内のキーはURLエンコードされている
+    object_key = unquote_plus(s3_info['object']['key'])
+    event_name = record['eventName']
 
-        return {'statusCode': 200, 'body': 'S3 event processed successfully'}
+    print(f"Processing S3 event: {event_name} for {bucket_name}/{object_key}")
 
+    # ファイルサイズとダイジェストを取得
+    error = None
+    try:
+        response = s3_client.head_object(Bucket=bucket_name, Key=object_key, ChecksumMode='ENABLED')
+        result = {
+            'status': 'completed',
+            'completed_at': get_current_timestamp(),
+            'file_size': response['ContentLength'],
+            'content_type': response.get('ContentType', 'unknown'),
+            **object_digest(response)
+        }
     except Exception as e:
         print(f"Error processing S3 event: {str(e)}")
-        # エラーを記録
-        if 'job' in locals():
-            db_manager.update_item(
-                {'id': context.request_id},
-                {'status': 'failed', 'error': str(e), 'failed_at': get_current_timestamp()}
-            )
-        raise
+        error = e
+        result = {'status': 'failed', 'error': str(e), 'failed_at': get_current_timestamp()}
 
+    # 署名付きURLでアップロードされたオブジェクトは発行時のジョブを更新する
+    match = UPLOAD_KEY_PATTERN.match(object_key)
+    if match:
+        update_upload_job(match.group(1), bucket_name, object_key, event_name, result)
+    else:
+        # 処理ジョブを記録（書き込みはハンドラー終了時にまとめて実行）
+        job_writer.add({
+            'id': context.request_id,
+            'type': 's3_processing',
+            'bucket': bucket_name,
+            'key': object_key,
+            'created_at': get_current_timestamp(),
+            'event_name': event_name,
+            'uri': f"s3://{bucket_name}/{object_key}",
+            **result
+        })
+
+    if error:
+        raise error
+
+
+def update_upload_job(job_id, bucket_name, object_key, event_name, result):
+    """アップロードジョブに処理結果を反映（発行時の属性と作成日時は保持する）"""
+    job = db_manager.get_item({'id': job_id}) or {}
+    expected_size = job.get('expected_size')
+    if result['status'] == 'completed' and expected_size is not None \
+            and int(expected_size) != result['file_size']:
+        print(f"Upload size mismatch for job {job_id}: expected {expected_size}, got {result['file_size']}")
+        result = {
+            **result,
+            'status': 'failed',
+            'error': f"Uploaded size {result['file_size']} does not match expected size {expected_size}",
+            'size_mismatch': True
+        }
+
+    # 発行時のレコードが無い場合（直接アップロードやTTL切れ）は初期値を補う
+    builder = UpdateExpressionBuilder()
+    builder.set_if_not_exists('type', 'upload')
+    builder.set_if_not_exists('created_at', get_current_timestamp())
+    builder.set_if_not_exists('bucket', bucket_name)
+    builder.set_if_not_exists('key', object_key)
+    builder.set_if_not_exists('uri', f"s3://{bucket_name}/{object_key}")
+    expiry = expires_at(RETENTION_DAYS)
+    if expiry is not None:
+        builder.set_if_not_exists(TTL_ATTRIBUTE, expiry)
+    builder.set('event_name', event_name)
 
+    db_manager.update_item({'id': job_id}, result, builder=builder, return_values='NONE')
+
+
+@router.route('/process', ['POST'])
 def handle_api_request(event, context):
     """APIリクエストを処理"""
     try:
@@ -125,7 +227,7 @@ def handle_api_request(event, context):
             'result': processed_data
         }
 
-        db_manager.update_item({'id': context.request_id}, updates)
+        db_manager.update_item({'id': context.request_id}, updates, return_values='NONE')
 
         return create_response(200, {
             'message': 'Data processed successfully',
@@ -138,6 +240,215 @@ def handle_api_request(event, context):
         return create_response(500, {'error': 'Failed to process data'})
 
 
+@router.route('/uploads', ['POST'], middleware=[require_fields('filename', 'size')])
+def create_upload(event, context):
+    """S3への直接アップロード用の署名付きURLを発行"""
+    try:
+        body = parse_json_body(event)
+
+        filename = sanitize_filename(body.get('filename', ''))
+        if not filename:
+            return create_response(400, {'error': 'Request body must contain "filename" field'})
+
+        size = body.get('size')
+        if not isinstance(size, int) or size <= 0:
+            return create_response(400, {'error': '"size" must be a positive integer (bytes)'})
+        if size > MAX_UPLOAD_BYTES:
+            return create_response(413, {'error': f'Upload exceeds {MAX_UPLOAD_BYTES} bytes'})
+
+        content_type = body.get('content_type', 'application/octet-stream')
+        job_id = str(uuid.uuid4())
+        object_key = f"{UPLOAD_PREFIX}{job_id}/{filename}"
+
+        if size > MULTIPART_THRESHOLD_BYTES:
+            upload = create_multipart_upload(object_key, content_type, size)
+        else:
+            upload = create_single_upload(object_key, content_type, body.get('sha256'))
+
+        # ジョブにはデータ本体ではなく格納先のポインタだけを記録
+        job = {
+            'id': job_id,
+            'type': 'upload',
+            'status': 'awaiting_upload',
+            'created_at': get_current_timestamp(),
+            'bucket': DATA_BUCKET_NAME,
+            'key': object_key,
+            'uri': f"s3://{DATA_BUCKET_NAME}/{object_key}",
+            'expected_size': size,
+            'content_type': content_type
+        }
+        if upload.get('upload_id'):
+            job['upload_id'] = upload['upload_id']
+
+        db_manager.put_item(job)
+
+        return create_response(201, {
+            'message': 'Upload URL created successfully',
+            'job_id': job_id,
+            'key': object_key,
+            'expires_in': UPLOAD_URL_EXPIRES_SECONDS,
+            **upload
+        })
+
+    except Exception as e:
+        print(f"Error creating upload: {str(e)}")
+        return create_response(500, {'error': 'Failed to create upload'})
+
+
+def create_single_upload(object_key, content_type, sha256=None):
+    """単一PUT用の署名付きURLを作成"""
+    params = {
+        'Bucket': DATA_BUCKET_NAME,
+        'Key': object_key,
+        'ContentType': content_type
+    }
+    headers = {'Content-Type': content_type}
+    if sha256:
+        # クライアントが送るダイジェストをS3側で検証させる
+        params['ChecksumSHA256'] = sha256
+        headers['x-amz-checksum-sha256'] = sha256
+
+    url = s3_client.generate_presigned_url(
+        'put_object',
+        Params=params,
+        ExpiresIn=UPLOAD_URL_EXPIRES_SECONDS
+    )
+
+    return {'method': 'PUT', 'url': url, 'headers': headers}
+
+
+def create_multipart_upload(object_key, content_type, size):
+    """マルチパートアップロードを開始し、パートごとの署名付きURLを作成"""
+    part_size = max(MULTIPART_PART_SIZE_BYTES, math.ceil(size / MAX_UPLOAD_PARTS))
+    part_count = math.ceil(size / part_size)
+
+    response = s3_client.create_multipart_upload(
+        Bucket=DATA_BUCKET_NAME,
+        Key=object_key,
+        ContentType=content_type
+    )
+    upload_id = response['UploadId']
+
+    parts = [
+        {
+            'part_number': part_number,
+            'url': s3_client.generate_presigned_url(
+                'upload_part',
+                Params={
+                    'Bucket': DATA_BUCKET_NAME,
+                    'Key': object_key,
+                    'UploadId': upload_id,
+                    'PartNumber': part_number
+                },
+                ExpiresIn=UPLOAD_URL_EXPIRES_SECONDS
+            )
+        }
+        for part_number in range(1, part_count + 1)
+    ]
+
+    return {
+        'method': 'MULTIPART',
+        'upload_id': upload_id,
+        'part_size': part_size,
+        'parts': parts
+    }
+
+
+@router.route('/uploads/{id}/complete', ['POST'])
+def complete_upload(event, context):
+    """マルチパートアップロードを完了"""
+    try:
+        job_id = get_path_parameter(event, 'id')
+        if not job_id:
+            return create_response(400, {'error': 'Job ID is required'})
+
+        job = db_manager.get_item({'id': job_id})
+        if not job or not job.get('upload_id'):
+            return create_response(404, {'error': 'Multipart upload not found'})
+
+        body = parse_json_body(event)
+        parts = body.get('parts') or []
+        if not parts or not all('part_number' in part and 'etag' in part for part in parts):
+            return create_response(400, {'error': '"parts" must list part_number and etag for each part'})
+
+        # 完了するとS3イベントが発火し、update_upload_jobがジョブを更新する
+        s3_client.complete_multipart_upload(
+            Bucket=job['bucket'],
+            Key=job['key'],
+            UploadId=job['upload_id'],
+            MultipartUpload={
+                'Parts': sorted(
+                    ({'PartNumber': int(part['part_number']), 'ETag': part['etag']} for part in parts),
+                    key=lambda part: part['PartNumber']
+                )
+            }
+        )
+
+        return create_response(200, {
+            'message': 'Upload completed successfully',
+            'job_id': job_id,
+            'key': job['key']
+        })
+
+    except Exception as e:
+        print(f"Error completing upload: {str(e)}")
+        return create_response(500, {'error': 'Failed to complete upload'})
+
+
+@router.route('/jobs', ['GET'])
+def list_jobs(event, context):
+    """ステータスと作成日時の範囲でジョブを検索（GSIを使用）"""
+    try:
+        status = get_query_parameter(event, 'status')
+        if not status:
+            return create_response(400, {'error': 'Query parameter "status" is required'})
+
+        try:
+            since, until = get_time_range(event)
+            start_key = decode_next_token(get_query_parameter(event, 'next_token'), key_names=('id', 'status', 'created_at'))
+            limit = get_limit(event)
+        except ValueError as e:
+            return create_response(400, {'error': str(e)})
+
+        # 新しい順に1ページ分だけ取得
+        try:
+            jobs, last_key = db_manager.query_page(
+                time_range_condition('status', status, since=since, until=until),
+                index_name=STATUS_INDEX_NAME,
+                limit=limit,
+                exclusive_start_key=start_key,
+                scan_forward=False
+            )
+        except ClientError as e:
+            # トークンのキーが検索条件（パーティションや時間範囲）と合わない場合
+            if start_key and is_validation_error(e):
+                return create_response(400, {'error': 'Invalid next_token'})
+            raise
+
+        return create_response(200, {
+            'jobs': jobs,
+            'count': len(jobs),
+            'next_token': encode_next_token(last_key)
+        })
+
+    except Exception as e:
+        print(f"Error listing jobs: {str(e)}")
+        return create_response(500, {'error': 'Failed to list jobs'})
+
+
+def sanitize_filename(filename):
+    """オブジェクトキーに使えるファイル名に整形"""
+    basename = os.path.basename(str(filename))
+    return re.sub(r'[^A-Za-z0-9._-]', '_', basename)[:200].lstrip('.')
+
+
+def object_digest(head_response):
+    """head_objectの結果からダイジェストを取得"""
+    if head_response.get('ChecksumSHA256'):
+        return {'digest': head_response['ChecksumSHA256'], 'digest_algorithm': 'sha256'}
+    return {'digest': head_response.get('ETag', '').strip('"'), 'digest_algorithm': 'etag'}
+
+
 def process_data(data):
     """データを処理する（サンプル実装）"""
     # 実際の処理ロジックをここに実装
@@ -1,22 +1,71 @@
 import json
 import datetime
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import boto3
+from botocore.config import Config
+
+
+ENVIRONMENT = os.environ.get('ENVIRONMENT', 'unknown')
+SERVICE_VERSION = os.environ.get('SERVICE_VERSION', os.environ.get('AWS_LAMBDA_FUNCTION_VERSION', 'unknown'))
+
+# 依存先の設定
+TABLE_NAMES = [
+    f"{ENVIRONMENT}-users",
+    f"{ENVIRONMENT}-processed-data",
+    f"{ENVIRONMENT}-notifications"
+]
+DATA_BUCKET_NAME = os.environ.get('DATA_BUCKET_NAME', '')
+NOTIFICATION_TOPIC_ARN = os.environ.get('NOTIFICATION_TOPIC_ARN', '')
+
+# プローブごとのタイムアウトと、結果キャッシュの有効期間（秒）
+PROBE_TIMEOUT_SECONDS = float(os.environ.get('HEALTH_PROBE_TIMEOUT_SECONDS', '2'))
+CACHE_TTL_SECONDS = float(os.environ.get('HEALTH_CACHE_TTL_SECONDS', '15'))
+
+# プローブ用クライアント（リトライせず、タイムアウトを短く設定）
+probe_config = Config(
+    connect_timeout=PROBE_TIMEOUT_SECONDS,
+    read_timeout=PROBE_TIMEOUT_SECONDS,
+    retries={'max_attempts': 1}
+)
+dynamodb_client = boto3.client('dynamodb', config=probe_config)
+s3_client = boto3.client('s3', config=probe_config)
+sns_client = boto3.client('sns', config=probe_config)
+
+# ウォームコンテナ内で再利用するスレッドプールと結果キャッシュ
+executor = ThreadPoolExecutor(max_workers=len(TABLE_NAMES) + 2)
+probe_cache = {'expires_at': 0.0, 'checked_at': None, 'results': None}
 
 
 def lambda_handler(event, context):
-    """ヘルスチェック用のエンドポイント"""
+    """ヘルスチェック用のエンドポイント
+
+    `?deep=1` を指定すると依存先（DynamoDB / S3 / SNS）を並列にプローブする。
+    """
 
     # 基本的なヘルスチェック情報
     health_info = {
         "status": "healthy",
         "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
-        "environment": os.environ.get('ENVIRONMENT', 'unknown'),
-        "version": "1.0.0",
+        "environment": ENVIRONMENT,
+        "version": SERVICE_VERSION,
         "service": "lambda-cicd-sample"
     }
+    status_code = 200
+
+    if is_deep_check(event):
+        results, cached, checked_at = get_probe_results()
+        health_info['dependencies'] = results
+        health_info['cached'] = cached
+        health_info['checked_at'] = checked_at
+        if any(result['status'] != 'healthy' for result in results.values()):
+            health_info['status'] = 'unhealthy'
+            status_code = 503
 
     return {
-        'statusCode': 200,
+        'statusCode': status_code,
         'headers': {
             'Content-Type': 'application/json',
             'Access-Control-Allow-Origin': '*',
@@ -24,4 +73,70 @@ def lambda_handler(event, context):
             'Access-Control-Allow-Methods': 'GET'
         },
         'body': json.dumps(health_info)
-    }
\ No newline at end of file
+    }
+
+
+def is_deep_check(event):
+    """ディープチェックが要求されているか判定"""
+    query_parameters = (event or {}).get('queryStringParameters') or {}
+    return query_parameters.get('deep', '').lower() in ('1', 'true', 'yes')
+
+
+def get_probe_results():
+    """プローブ結果を取得（TTL内はキャッシュを返す）"""
+    now = time.time()
+    if probe_cache['results'] is not None and now < probe_cache['expires_at']:
+        return probe_cache['results'], True, probe_cache['checked_at']
+
+    results = run_probes()
+    probe_cache['results'] = results
+    probe_cache['checked_at'] = datetime.datetime.utcnow().isoformat() + "Z"
+    probe_cache['expires_at'] = time.time() + CACHE_TTL_SECONDS
+    return results, False, probe_cache['checked_at']
+
+
+def build_probes():
+    """依存先ごとのプローブ関数を作成"""
+    probes = {}
+    for table_name in TABLE_NAMES:
+        probes[f"dynamodb:{table_name}"] = (
+            lambda name=table_name: dynamodb_client.describe_table(TableName=name)
+        )
+    if DATA_BUCKET_NAME:
+        probes[f"s3:{DATA_BUCKET_NAME}"] = lambda: s3_client.head_bucket(Bucket=DATA_BUCKET_NAME)
+    if NOTIFICATION_TOPIC_ARN:
+        probes['sns:notification-topic'] = (
+            lambda: sns_client.get_topic_attributes(TopicArn=NOTIFICATION_TOPIC_ARN)
+        )
+    return probes
+
+
+def timed_probe(probe):
+    """プローブを実行して所要時間を計測"""
+    started = time.perf_counter()
+    probe()
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def run_probes():
+    """すべてのプローブを並列に実行"""
+    futures = {name: executor.submit(timed_probe, probe) for name, probe in build_probes().items()}
+
+    # 全体の待ち時間もプローブ1件分のタイムアウトに収める
+    deadline = time.perf_counter() + PROBE_TIMEOUT_SECONDS
+    results = {}
+    for name, future in futures.items():
+        try:
+            latency_ms = future.result(timeout=max(deadline - time.perf_counter(), 0))
+            results[name] = {'status': 'healthy', 'latency_ms': latency_ms}
+        except FutureTimeoutError:
+            results[name] = {
+                'status': 'unhealthy',
+                'latency_ms': PROBE_TIMEOUT_SECONDS * 1000,
+                'error': 'Probe timed out'
+            }
+        except Exception as e:
+            print(f"Health probe failed for {name}: {str(e)}")
+            results[name] = {'status': 'unhealthy', 'error': type(e).__name__}
+
+    return results
@@ -1,24 +1,190 @@
+import json
+import time
 import boto3
-from typing import Dict, Any, List, Optional
+from typing import TYPE_CHECKING, Dict, Any, Iterator, List, Optional, Tuple, Union
 from botocore.exceptions import ClientError
+from boto3.dynamodb.conditions import ConditionBase, Key
+from boto3.dynamodb.types import TypeDeserializer
 import logging
 
+if TYPE_CHECKING:
+    # 型ヒント専用（S3クライアントをコールドスタートで作らないよう実行時には読み込まない）
+    from storage import S3OffloadPolicy
+
 logger = logging.getLogger()
 
 # DynamoDBクライアント
 dynamodb = boto3.resource('dynamodb')
 
+# 属性パス: ドット区切りの文字列、またはセグメントのタプル
+FieldPath = Union[str, Tuple[str, ...]]
+
+# TTL（有効期限）に使う属性名。値はエポック秒
+TTL_ATTRIBUTE = 'expires_at'
+
+deserializer = TypeDeserializer()
+
+
+def expires_at(ttl_days: Optional[int]) -> Optional[int]:
+    """現在からttl_days日後のエポック秒（Noneや0ならTTLなし）"""
+    if not ttl_days:
+        return None
+    return int(time.time()) + int(ttl_days) * 24 * 60 * 60
+
+
+def with_ttl(item: Dict[str, Any], ttl_days: Optional[int]) -> Dict[str, Any]:
+    """TTL属性が無ければ付与したアイテムを返す"""
+    expiry = expires_at(ttl_days)
+    if expiry is None or TTL_ATTRIBUTE in item:
+        return item
+    return {**item, TTL_ATTRIBUTE: expiry}
+
+
+def deserialize_image(image: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """DynamoDB Streamsのイメージ（DynamoDB JSON）をPythonの辞書に変換"""
+    if not image:
+        return None
+    return {key: deserializer.deserialize(value) for key, value in image.items()}
+
+
+class UpdateExpressionBuilder:
+    """プレースホルダー付きのUpdateExpressionを組み立てるクラス
+
+    属性名は常に ExpressionAttributeNames 経由で参照するため、
+    `status` や `data` などの予約語もそのまま指定できる。
+    """
+
+    def __init__(self):
+        self._set_parts: List[str] = []
+        self._add_parts: List[str] = []
+        self._remove_parts: List[str] = []
+        self._names: Dict[str, str] = {}
+        self._placeholders: Dict[str, str] = {}
+        self._values: Dict[str, Any] = {}
+
+    def _name(self, field: FieldPath) -> str:
+        """属性名のプレースホルダーを取得
+
+        文字列はドット区切りのネストしたパスとして扱う。
+        ドットを含む属性名はタプルでセグメントを指定する。
+        """
+        parts = field.split('.') if isinstance(field, str) else field
+        placeholders = []
+        for part in parts:
+            placeholder = self._placeholders.get(part)
+            if placeholder is None:
+                placeholder = f"#f{len(self._names)}"
+                self._names[placeholder] = part
+                self._placeholders[part] = placeholder
+            placeholders.append(placeholder)
+        return '.'.join(placeholders)
+
+    def _value(self, value: Any) -> str:
+        """値のプレースホルダーを登録"""
+        placeholder = f":u{len(self._values)}"
+        self._values[placeholder] = value
+        return placeholder
+
+    def set(self, field: FieldPath, value: Any) -> 'UpdateExpressionBuilder':
+        """SET field = value"""
+        self._set_parts.append(f"{self._name(field)} = {self._value(value)}")
+        return self
+
+    def set_if_not_exists(self, field: FieldPath, value: Any) -> 'UpdateExpressionBuilder':
+        """SET field = if_not_exists(field, value)"""
+        name = self._name(field)
+        self._set_parts.append(f"{name} = if_not_exists({name}, {self._value(value)})")
+        return self
+
+    def add(self, field: FieldPath, amount: Union[int, float, set]) -> 'UpdateExpressionBuilder':
+        """ADD field amount（アトミックカウンター / セットへの追加）"""
+        self._add_parts.append(f"{self._name(field)} {self._value(amount)}")
+        return self
+
+    def remove(self, field: FieldPath) -> 'UpdateExpressionBuilder':
+        """REMOVE field"""
+        self._remove_parts.append(self._name(field))
+        return self
+
+    def is_empty(self) -> bool:
+        """更新句が1つも無いかどうか"""
+        return not (self._set_parts or self._add_parts or self._remove_parts)
+
+    def build(self) -> Dict[str, Any]:
+        """update_item に渡すパラメータを生成"""
+        if self.is_empty():
+            raise ValueError("Update expression has no actions")
+
+        clauses = []
+        if self._set_parts:
+            clauses.append("SET " + ", ".join(self._set_parts))
+        if self._add_parts:
+            clauses.append("ADD " + ", ".join(self._add_parts))
+        if self._remove_parts:
+            clauses.append("REMOVE " + ", ".join(self._remove_parts))
+
+        params: Dict[str, Any] = {
+            'UpdateExpression': " ".join(clauses),
+            'ExpressionAttributeNames': dict(self._names)
+        }
+        if self._values:
+            params['ExpressionAttributeValues'] = dict(self._values)
+        return params
+
+
+def is_conditional_check_failed(error: ClientError) -> bool:
+    """ConditionExpressionの不一致による失敗かどうかを判定"""
+    return error.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException'
+
+
+def is_validation_error(error: ClientError) -> bool:
+    """リクエストのパラメータ不正（ValidationException）による失敗かどうかを判定"""
+    return error.response.get('Error', {}).get('Code') == 'ValidationException'
+
+
+def time_range_condition(
+    partition_name: str,
+    partition_value: Any,
+    sort_name: str = 'created_at',
+    since: Optional[str] = None,
+    until: Optional[str] = None
+) -> ConditionBase:
+    """パーティションキーとソートキーの時間範囲からKeyConditionを作成"""
+    condition = Key(partition_name).eq(partition_value)
+    if since and until:
+        return condition & Key(sort_name).between(since, until)
+    if since:
+        return condition & Key(sort_name).gte(since)
+    if until:
+        return condition & Key(sort_name).lte(until)
+    return condition
+
 
 class DynamoDBManager:
-    """シンプルなDynamoDB操作を提供するクラス"""
+    """シンプルなDynamoDB操作を提供するクラス
+
+    offload を指定すると、大きな属性はS3に退避してポインタだけを保存し、
+    読み取り時に透過的に復元する。ttl_days を指定すると put_item する
+    アイテムに有効期限（expires_at）を付与する。
+    """
 
-    def __init__(self, table_name: str):
+    def __init__(self, table_name: str, offload: Optional['S3OffloadPolicy'] = None,
+                 ttl_days: Optional[int] = None):
         self.table_name = table_name
         self.table = dynamodb.Table(table_name)
+        self.offload = offload
+        self.ttl_days = ttl_days
+
+    def _rehydrate(self, item: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """オフロード済みの属性を復元"""
+        return self.offload.rehydrate(item) if self.offload else item
 
     def put_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
         """アイテムをテーブルに追加"""
         try:
+            item = with_ttl(item, self.ttl_days)
+            if self.offload:
+                item = self.offload.offload_attributes(self.table_name, item)
             response = self.table.put_item(Item=item)
             logger.info(f"Put item success: {item.get('id', 'unknown')}")
             return response
@@ -30,7 +196,7 @@ class DynamoDBManager:
         """キーでアイテムを取得"""
         try:
             response = self.table.get_item(Key=key)
-            return response.get('Item')
+            return self._rehydrate(response.get('Item'))
         except ClientError as e:
             logger.error(f"Error getting item: {e}")
             raise
@@ -39,32 +205,149 @@ class DynamoDBManager:
         """テーブルをスキャン"""
         try:
             response = self.table.scan(Limit=limit)
-            return response.get('Items', [])
+            return [self._rehydrate(item) for item in response.get('Items', [])]
         except ClientError as e:
             logger.error(f"Error scanning table: {e}")
             raise
 
-    def update_item(self, key: Dict[str, Any], updates: Dict[str, Any]) -> Dict[str, Any]:
-        """アイテムを更新"""
+    def scan(self, page_size: int = 100) -> Iterator[Dict[str, Any]]:
+        """テーブル全体をページをまたいで1件ずつ返すジェネレーター"""
+        params: Dict[str, Any] = {'Limit': page_size}
+        while True:
+            try:
+                response = self.table.scan(**params)
+            except ClientError as e:
+                logger.error(f"Error scanning table: {e}")
+                raise
+            for item in response.get('Items', []):
+                yield self._rehydrate(item)
+            if not response.get('LastEvaluatedKey'):
+                return
+            params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def query_page(
+        self,
+        key_condition: ConditionBase,
+        index_name: Optional[str] = None,
+        filter_expression: Optional[ConditionBase] = None,
+        limit: int = 100,
+        exclusive_start_key: Optional[Dict[str, Any]] = None,
+        scan_forward: bool = True
+    ) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """クエリを1ページ分実行し、(アイテム, LastEvaluatedKey) を返す"""
+        params: Dict[str, Any] = {
+            'KeyConditionExpression': key_condition,
+            'Limit': limit,
+            'ScanIndexForward': scan_forward
+        }
+        if index_name:
+            params['IndexName'] = index_name
+        if filter_expression is not None:
+            params['FilterExpression'] = filter_expression
+        if exclusive_start_key:
+            params['ExclusiveStartKey'] = exclusive_start_key
+
         try:
-            update_expression_parts = []
-            expression_attribute_values = {}
-
-            for field, value in updates.items():
-                update_expression_parts.append(f"{field} = :{field}")
-                expression_attribute_values[f":{field}"] = value
-
-            response = self.table.update_item(
-                Key=key,
-                UpdateExpression="SET " + ", ".join(update_expression_parts),
-                ExpressionAttributeValues=expression_attribute_values,
-                ReturnValues="ALL_NEW"
+            response = self.table.query(**params)
+            items = [self._rehydrate(item) for item in response.get('Items', [])]
+            return items, response.get('LastEvaluatedKey')
+        except ClientError as e:
+            logger.error(f"Error querying table: {e}")
+            raise
+
+    def query(
+        self,
+        key_condition: ConditionBase,
+        index_name: Optional[str] = None,
+        filter_expression: Optional[ConditionBase] = None,
+        page_size: int = 100,
+        scan_forward: bool = True
+    ) -> Iterator[Dict[str, Any]]:
+        """クエリ結果をページをまたいで1件ずつ返すジェネレーター"""
+        start_key = None
+        while True:
+            items, start_key = self.query_page(
+                key_condition,
+                index_name=index_name,
+                filter_expression=filter_expression,
+                limit=page_size,
+                exclusive_start_key=start_key,
+                scan_forward=scan_forward
             )
-            return response.get('Attributes', {})
+            yield from items
+            if not start_key:
+                return
+
+    def update_item(
+        self,
+        key: Dict[str, Any],
+        updates: Optional[Dict[str, Any]] = None,
+        builder: Optional[UpdateExpressionBuilder] = None,
+        condition: Optional[Union[ConditionBase, str]] = None,
+        condition_names: Optional[Dict[str, str]] = None,
+        condition_values: Optional[Dict[str, Any]] = None,
+        return_values: str = 'ALL_NEW'
+    ) -> Dict[str, Any]:
+        """アイテムを更新
+
+        updates の各フィールドは SET として builder に追加される。
+        condition には boto3 の Attr/Key 条件か文字列の式を指定できる
+        （文字列の場合、プレースホルダーは condition_names / condition_values で渡す。
+        builder が使う #fN / :uN と重複すると ValueError）。
+        """
+        builder = builder or UpdateExpressionBuilder()
+        if updates and self.offload:
+            offloaded = self.offload.offload_attributes(self.table_name, updates)
+            # 以前の値（またはポインタ）が残らないよう、今回使わない方の属性は削除する
+            for field in self.offload.replaced_attributes(updates, offloaded):
+                builder.remove((field,))
+            updates = offloaded
+        for field, value in (updates or {}).items():
+            builder.set(field, value)
+
+        params = builder.build()
+        params['Key'] = key
+        params['ReturnValues'] = return_values
+
+        if condition is not None:
+            params['ConditionExpression'] = condition
+            # builder のプレースホルダー（#fN / :uN）を上書きしないよう重複は拒否する
+            for placeholders, existing in (
+                (condition_names, params['ExpressionAttributeNames']),
+                (condition_values, params.get('ExpressionAttributeValues', {}))
+            ):
+                overlap = set(placeholders or {}) & set(existing)
+                if overlap:
+                    raise ValueError(f"Condition placeholders collide with update placeholders: {sorted(overlap)}")
+            if condition_names:
+                params['ExpressionAttributeNames'].update(condition_names)
+            if condition_values:
+                params.setdefault('ExpressionAttributeValues', {}).update(condition_values)
+
+        try:
+            response = self.table.update_item(**params)
+            return self._rehydrate(response.get('Attributes', {}))
         except ClientError as e:
-            logger.error(f"Error updating item: {e}")
+            if is_conditional_check_failed(e):
+                logger.warning(f"Conditional update rejected: {key}")
+            else:
+                logger.error(f"Error updating item: {e}")
             raise
 
+    def increment(
+        self,
+        key: Dict[str, Any],
+        field: FieldPath,
+        amount: Union[int, float] = 1,
+        return_values: str = 'UPDATED_NEW'
+    ) -> Dict[str, Any]:
+        """アトミックカウンターを加算（読み取り不要の1回の呼び出し）"""
+        return self.update_item(
+            key,
+            builder=UpdateExpressionBuilder().add(field, amount),
+            return_values=return_values
+        )
+
     def delete_item(self, key: Dict[str, Any]) -> bool:
         """アイテムを削除"""
         try:
@@ -74,3 +357,114 @@ class DynamoDBManager:
         except ClientError as e:
             logger.error(f"Error deleting item: {e}")
             raise
+
+
+class BatchWriteError(Exception):
+    """BufferedWriter が一部のレコードを書き込めなかったことを表す例外"""
+
+    def __init__(self, table_name: str, failed: List[Dict[str, Any]]):
+        super().__init__(f"Failed to write {len(failed)} records to {table_name}")
+        self.table_name = table_name
+        self.failed = failed
+
+
+class BufferedWriter:
+    """監査レコードをバッファし、まとめてBatchWriteItemで書き込むクラス
+
+    レコードは呼び出し中にメモリへ蓄積し、flush_threshold 件に達した時点か
+    ハンドラー終了時の flush() で書き込む。書き込めなかったレコードはログに
+    出力して次の flush() の結果に含め、次の呼び出しへは持ち越さない
+    （トリガー経由の呼び出しは raise_on_failure=True で失敗させ、Lambdaに再試行させる）。
+    """
+
+    # BatchWriteItemの1リクエストあたりの上限
+    MAX_BATCH_SIZE = 25
+
+    def __init__(self, table_name: str, key_names: Tuple[str, ...] = ('id',),
+                 flush_threshold: int = MAX_BATCH_SIZE, max_retries: int = 3,
+                 ttl_days: Optional[int] = None):
+        self.table_name = table_name
+        self.ttl_days = ttl_days
+        self.key_names = key_names
+        self.flush_threshold = flush_threshold
+        self.max_retries = max_retries
+        self.client = dynamodb.meta.client
+        self._buffer: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+        # しきい値到達時の flush() で書き込めなかったレコード
+        self._failed: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def __enter__(self) -> 'BufferedWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.flush()
+
+    def add(self, item: Dict[str, Any]) -> None:
+        """レコードをバッファに追加（同じキーは後勝ち）"""
+        item = with_ttl(item, self.ttl_days)
+        key = tuple(item[name] for name in self.key_names)
+        self._buffer.pop(key, None)
+        self._buffer[key] = item
+        if len(self._buffer) >= self.flush_threshold:
+            # 失敗したレコードは最後の flush() で報告する
+            failed = self.flush()['failed']
+            self._failed.extend(failed)
+
+    def flush(self, raise_on_failure: bool = False) -> Dict[str, Any]:
+        """バッファ内のレコードを書き込み、結果を返す
+
+        バッファは成否にかかわらず空にする。raise_on_failure=True の場合、
+        書き込めなかったレコードがあれば BatchWriteError を送出する。
+        """
+        pending = list(self._buffer.items())
+        self._buffer = {}
+        written = 0
+        new_failures: List[Dict[str, Any]] = []
+
+        for start in range(0, len(pending), self.MAX_BATCH_SIZE):
+            chunk = pending[start:start + self.MAX_BATCH_SIZE]
+            unprocessed = self._write_batch([item for _, item in chunk])
+            unprocessed_keys = {tuple(item[name] for name in self.key_names) for item in unprocessed}
+
+            for key, item in chunk:
+                if key in unprocessed_keys:
+                    new_failures.append(item)
+                else:
+                    written += 1
+
+        if new_failures:
+            logger.error(
+                f"Failed to flush {len(new_failures)} records to {self.table_name}: "
+                f"{json.dumps(new_failures, default=str)}"
+            )
+        elif written:
+            logger.info(f"Flushed {written} records to {self.table_name}")
+
+        failed, self._failed = self._failed + new_failures, []
+        if failed and raise_on_failure:
+            raise BatchWriteError(self.table_name, failed)
+
+        return {'written': written, 'failed': failed}
+
+    def _write_batch(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """1バッチを書き込み、最終的に書き込めなかったレコードを返す"""
+        requests = [{'PutRequest': {'Item': item}} for item in items]
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.client.batch_write_item(RequestItems={self.table_name: requests})
+            except ClientError as e:
+                logger.error(f"Error batch writing items: {e}")
+                return [request['PutRequest']['Item'] for request in requests]
+
+            requests = response.get('UnprocessedItems', {}).get(self.table_name, [])
+            if not requests:
+                return []
+            if attempt < self.max_retries:
+                # スロットリング時は指数バックオフで再試行
+                time.sleep(0.05 * (2 ** attempt))
+
+        return [request['PutRequest']['Item'] for request in requests]
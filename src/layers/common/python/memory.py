@@ -0,0 +1,116 @@
+import gc
+import os
+import logging
+import tracemalloc
+from functools import wraps
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+
+logger = logging.getLogger()
+
+T = TypeVar('T')
+
+# /proc/self/statm のページサイズ
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+class MemoryBudgetExceeded(Exception):
+    """メモリ使用量が上限に達したことを表す例外"""
+    pass
+
+
+class MemoryBudget:
+    """関数のMemorySizeに対するメモリ使用量を監視するクラス
+
+    check_every 件ごとに使用量を確認し、soft_limit を超えたら on_pressure
+    （バッファのフラッシュなど）とGCで解放を試みる。それでも hard_limit を
+    超えている場合は MemoryBudgetExceeded を送出し、OOMで強制終了される前に
+    ハンドラーが残りのレコードを再試行に回せるようにする。
+    """
+
+    def __init__(self, limit_mb: Optional[int] = None, soft_limit: float = 0.75,
+                 hard_limit: float = 0.9, check_every: int = 50,
+                 use_tracemalloc: Optional[bool] = None):
+        limit_mb = limit_mb or int(os.environ.get('AWS_LAMBDA_FUNCTION_MEMORY_SIZE', '512'))
+        self.limit_bytes = limit_mb * 1024 * 1024
+        self.soft_limit = soft_limit
+        self.hard_limit = hard_limit
+        self.check_every = check_every
+        if use_tracemalloc is None:
+            use_tracemalloc = os.environ.get('MEMORY_TRACEMALLOC', '').lower() in ('1', 'true')
+        self.use_tracemalloc = use_tracemalloc
+        self.peak_bytes = 0
+        self.pressure_events = 0
+
+    def usage_bytes(self) -> int:
+        """現在のメモリ使用量（tracemalloc有効時はPythonの割り当て量、それ以外はRSS）"""
+        if self.use_tracemalloc and tracemalloc.is_tracing():
+            usage = tracemalloc.get_traced_memory()[0]
+        else:
+            usage = read_rss_bytes()
+        self.peak_bytes = max(self.peak_bytes, usage)
+        return usage
+
+    def reset(self) -> None:
+        """呼び出しごとの統計をリセット"""
+        self.peak_bytes = 0
+        self.pressure_events = 0
+        if self.use_tracemalloc:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+
+    def check(self, on_pressure: Optional[Callable[[], object]] = None) -> None:
+        """使用量を確認し、必要なら解放を試みて上限超過時は例外を送出"""
+        usage = self.usage_bytes()
+        if usage < self.limit_bytes * self.soft_limit:
+            return
+
+        self.pressure_events += 1
+        logger.warning(f"Memory pressure: {usage // (1024 * 1024)}MB of {self.limit_bytes // (1024 * 1024)}MB")
+        if on_pressure:
+            on_pressure()
+        gc.collect()
+
+        usage = self.usage_bytes()
+        if usage >= self.limit_bytes * self.hard_limit:
+            raise MemoryBudgetExceeded(
+                f"Memory usage {usage // (1024 * 1024)}MB exceeds "
+                f"{int(self.hard_limit * 100)}% of {self.limit_bytes // (1024 * 1024)}MB"
+            )
+
+    def iterate(self, items: Iterable[T], on_pressure: Optional[Callable[[], object]] = None) -> Iterator[T]:
+        """check_every 件ごとにメモリを確認しながら要素を返すジェネレーター"""
+        for index, item in enumerate(items):
+            if index and index % self.check_every == 0:
+                self.check(on_pressure)
+            yield item
+
+    def profile(self, handler: Callable) -> Callable:
+        """ハンドラーの呼び出しごとにピークメモリをログに出すデコレーター"""
+        @wraps(handler)
+        def wrapper(event, context):
+            self.reset()
+            self.usage_bytes()
+            try:
+                return handler(event, context)
+            finally:
+                self.usage_bytes()
+                peak = self.peak_bytes
+                if self.use_tracemalloc and tracemalloc.is_tracing():
+                    peak = max(peak, tracemalloc.get_traced_memory()[1])
+                logger.info(
+                    f"Peak memory: {peak // (1024 * 1024)}MB of {self.limit_bytes // (1024 * 1024)}MB "
+                    f"({self.pressure_events} pressure events)"
+                )
+        return wrapper
+
+
+def read_rss_bytes() -> int:
+    """プロセスの常駐メモリ（RSS）を取得"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        # /proc が無い環境ではピークRSSで代用
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
@@ -0,0 +1,164 @@
+import re
+import time
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Pattern, Tuple
+
+from utils import create_response, parse_json_body
+from validators import validate_required_fields
+
+logger = logging.getLogger()
+
+# ルートハンドラー: (event, context) -> APIレスポンス
+Handler = Callable[[Dict[str, Any], Any], Dict[str, Any]]
+# ミドルウェア: ハンドラーを受け取り、ラップしたハンドラーを返す
+Middleware = Callable[[Handler], Handler]
+
+# cached() が作成したキャッシュ（テストや設定変更時にまとめて破棄する）
+_response_caches: List[Dict[Any, Any]] = []
+
+
+class Router:
+    """API Gatewayイベントを宣言的に振り分けるルーター
+
+    ルートは登録時にミドルウェアを合成した上で (resource, method) の辞書に
+    格納するため、ディスパッチは1回の辞書参照で済む。resource を持たない
+    イベントは path をコンパイル済みのパターンと照合し、pathParameters を補う。
+    """
+
+    def __init__(self, middleware: Iterable[Middleware] = ()):
+        self.middleware = list(middleware)
+        self._routes: Dict[Tuple[str, str], Handler] = {}
+        self._methods: Dict[str, List[str]] = {}
+        self._patterns: List[Tuple[Pattern, str]] = []
+
+    def route(self, resource: str, methods: Iterable[str],
+              middleware: Iterable[Middleware] = ()) -> Callable[[Handler], Handler]:
+        """ルートを登録するデコレーター"""
+        def decorator(handler: Handler) -> Handler:
+            for method in methods:
+                self.add(resource, method, handler, middleware)
+            return handler
+        return decorator
+
+    def add(self, resource: str, method: str, handler: Handler,
+            middleware: Iterable[Middleware] = ()) -> None:
+        """ルートを登録（ミドルウェアはここで一度だけ合成する）"""
+        method = method.upper()
+        wrapped = handler
+        # 先に指定したミドルウェアが外側になるよう逆順に適用
+        for apply in reversed(self.middleware + list(middleware)):
+            wrapped = apply(wrapped)
+
+        self._routes[(resource, method)] = wrapped
+        if resource not in self._methods:
+            self._methods[resource] = []
+            self._patterns.append((compile_resource(resource), resource))
+            # 固定パスがパスパラメータ付きのパターンより優先されるように並べる
+            self._patterns.sort(key=lambda entry: entry[1].count('{'))
+        self._methods[resource].append(method)
+
+    def allowed_methods(self, resource: str) -> List[str]:
+        """リソースに登録されているメソッドの一覧"""
+        return sorted(self._methods.get(resource, []) + ['OPTIONS'])
+
+    def resolve(self, event: Dict[str, Any]) -> Optional[str]:
+        """イベントに対応するリソースを特定"""
+        resource = event.get('resource')
+        if resource in self._methods:
+            return resource
+
+        path = event.get('path') or ''
+        for pattern, candidate in self._patterns:
+            match = pattern.match(path)
+            if match:
+                event['resource'] = candidate
+                event['pathParameters'] = {**(event.get('pathParameters') or {}), **match.groupdict()}
+                return candidate
+        return None
+
+    def dispatch(self, event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+        """イベントを該当するハンドラーに振り分ける"""
+        resource = self.resolve(event)
+        if resource is None:
+            return create_response(404, {'error': 'Resource not found'})
+
+        method = (event.get('httpMethod') or '').upper()
+        handler = self._routes.get((resource, method))
+        if handler:
+            return handler(event, context)
+
+        allow = ','.join(self.allowed_methods(resource))
+        if method == 'OPTIONS':
+            response = create_response(204, {}, {'Allow': allow, 'Access-Control-Allow-Methods': allow})
+            response['body'] = ''
+            return response
+        return create_response(405, {'error': 'Method not allowed'}, {'Allow': allow})
+
+
+def compile_resource(resource: str) -> Pattern:
+    """/users/{id} 形式のリソースを正規表現にコンパイル（{proxy+} は複数階層に一致）"""
+    pattern = re.escape(resource)
+    pattern = re.sub(r'\\\{(\w+)\\\+\\\}', r'(?P<\1>.+)', pattern)
+    pattern = re.sub(r'\\\{(\w+)\\\}', r'(?P<\1>[^/]+)', pattern)
+    return re.compile(f"^{pattern}/?$")
+
+
+def timed(handler: Handler) -> Handler:
+    """処理時間をログとServer-Timingヘッダーに記録するミドルウェア"""
+    def wrapper(event, context):
+        started = time.perf_counter()
+        response = handler(event, context)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"{event.get('httpMethod')} {event.get('resource')} -> "
+                    f"{response.get('statusCode')} in {elapsed_ms:.1f}ms")
+        response.setdefault('headers', {})['Server-Timing'] = f"app;dur={elapsed_ms:.1f}"
+        return response
+    return wrapper
+
+
+def require_fields(*fields: str) -> Middleware:
+    """JSONボディの必須フィールドを検証するミドルウェア"""
+    def middleware(handler: Handler) -> Handler:
+        def wrapper(event, context):
+            is_valid, missing = validate_required_fields(parse_json_body(event), list(fields))
+            if not is_valid:
+                return create_response(400, {'error': f'Missing required fields: {", ".join(missing)}'})
+            return handler(event, context)
+        return wrapper
+    return middleware
+
+
+def cached(ttl_seconds: float, max_entries: int = 256) -> Middleware:
+    """成功したレスポンスをウォームコンテナ内でキャッシュするミドルウェア
+
+    キーはパスとクエリパラメータ。GETなど副作用の無いルートにのみ使う。
+    """
+    def middleware(handler: Handler) -> Handler:
+        cache: Dict[Tuple[Any, ...], Tuple[float, Dict[str, Any]]] = {}
+        _response_caches.append(cache)
+
+        def wrapper(event, context):
+            key = (
+                event.get('path') or event.get('resource'),
+                tuple(sorted((event.get('pathParameters') or {}).items())),
+                tuple(sorted((event.get('queryStringParameters') or {}).items()))
+            )
+            now = time.monotonic()
+            entry = cache.get(key)
+            if entry and entry[0] > now:
+                return {**entry[1], 'headers': {**entry[1].get('headers', {}), 'X-Cache': 'HIT'}}
+
+            response = handler(event, context)
+            if response.get('statusCode') == 200:
+                if len(cache) >= max_entries:
+                    cache.clear()
+                cache[key] = (now + ttl_seconds, response)
+            return response
+        return wrapper
+    return middleware
+
+
+def clear_response_caches() -> None:
+    """cached() のキャッシュをすべて破棄"""
+    for cache in _response_caches:
+        cache.clear()
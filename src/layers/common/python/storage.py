@@ -0,0 +1,199 @@
+import base64
+import gzip
+import hashlib
+import json
+import logging
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+import boto3
+from boto3.dynamodb.types import Binary
+
+logger = logging.getLogger()
+
+# S3クライアント
+s3_client = boto3.client('s3')
+
+# オフロードした属性のポインタは予約済みの属性（data → _offloaded_data）に保存する
+# （値の中身ではなく属性名で判別するため、入力データがポインタを装うことはできない）
+OFFLOADED_PREFIX = '_offloaded_'
+ENCODING = 'json+gzip'
+
+# JSONに無い型（セット / バイナリ / floatで表せない数値）を復元するためのマーカー
+SET_MARKER = '__set__'
+BYTES_MARKER = '__bytes__'
+NUMBER_MARKER = '__num__'
+
+
+def _json_default(value: Any) -> Any:
+    """DynamoDBの型をJSONに変換（セットとバイナリは復元できるようマーカー付きで保存）
+
+    数値はJSONの数値のまま保存し、floatで正確に表せない場合だけ文字列のマーカーにする。
+    """
+    if isinstance(value, Decimal):
+        if value == value.to_integral_value():
+            return int(value)
+        if Decimal(repr(float(value))) == value:
+            return float(value)
+        return {NUMBER_MARKER: str(value)}
+    if isinstance(value, Binary):
+        value = value.value
+    if isinstance(value, (bytes, bytearray)):
+        return {BYTES_MARKER: base64.b64encode(value).decode('ascii')}
+    if isinstance(value, (set, frozenset)):
+        return {SET_MARKER: sorted(value, key=str)}
+    raise TypeError(f"Object of type {type(value).__name__} is not supported for offloading")
+
+
+def _object_hook(value: Dict[str, Any]) -> Any:
+    """マーカー付きの値をセット / バイナリ / 数値に戻す"""
+    if len(value) == 1:
+        if SET_MARKER in value:
+            return set(value[SET_MARKER])
+        if BYTES_MARKER in value:
+            return base64.b64decode(value[BYTES_MARKER])
+        if NUMBER_MARKER in value:
+            return Decimal(value[NUMBER_MARKER])
+    return value
+
+
+def encode_value(value: Any) -> bytes:
+    """値をJSONにしてgzip圧縮"""
+    return gzip.compress(
+        json.dumps(value, default=_json_default, separators=(',', ':')).encode('utf-8')
+    )
+
+
+def encode_lines(values: Iterable[Any]) -> bytes:
+    """値をJSON Lines形式にしてgzip圧縮"""
+    lines = (json.dumps(value, default=_json_default, separators=(',', ':')) for value in values)
+    return gzip.compress(('\n'.join(lines) + '\n').encode('utf-8'))
+
+
+def decode_value(payload: bytes) -> Any:
+    """gzip圧縮されたJSONを復元（数値は整数も含めDynamoDBと同じDecimalで返す）"""
+    return json.loads(
+        gzip.decompress(payload).decode('utf-8'),
+        parse_int=Decimal,
+        parse_float=Decimal,
+        object_hook=_object_hook
+    )
+
+
+def estimate_size(value: Any) -> int:
+    """属性値のおおよそのバイト数"""
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return len(json.dumps(value, default=_json_default, separators=(',', ':')).encode('utf-8'))
+
+
+def pointer_attribute(name: str) -> str:
+    """オフロードした属性のポインタを保存する属性名"""
+    return f"{OFFLOADED_PREFIX}{name}"
+
+
+class S3OffloadPolicy:
+    """大きな属性値をS3へ退避し、アイテムにはポインタだけを残すポリシー
+
+    threshold_bytes を超える属性は個別にS3へ書き込み、元の属性の代わりに
+    予約済みの属性（_offloaded_<name>）へポインタを保存する。アイテム全体が
+    max_item_bytes を超える場合は、大きい属性から順に追加で退避する。
+    オブジェクトキーは内容のハッシュで決まるため、同じ値の再書き込みは冪等。
+    読み戻すのは bucket_name / prefix 配下を指すポインタだけ。
+    """
+
+    def __init__(
+        self,
+        bucket_name: str,
+        prefix: str = 'offload/',
+        threshold_bytes: int = 32 * 1024,
+        max_item_bytes: int = 300 * 1024,
+        inline_attributes: Iterable[str] = ('id',)
+    ):
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+        self.threshold_bytes = threshold_bytes
+        self.max_item_bytes = max_item_bytes
+        self.inline_attributes = set(inline_attributes)
+
+    def offload_attributes(self, table_name: str, attributes: Dict[str, Any]) -> Dict[str, Any]:
+        """しきい値を超える属性をS3に書き込み、ポインタの属性に置き換えた辞書を返す
+
+        予約済みの接頭辞で始まる属性名は ValueError で拒否する。
+        """
+        reserved = sorted(name for name in attributes if name.startswith(OFFLOADED_PREFIX))
+        if reserved:
+            raise ValueError(f"Attribute names reserved for offloading: {reserved}")
+
+        result = dict(attributes)
+        sizes = {
+            name: estimate_size(value)
+            for name, value in attributes.items()
+            if name not in self.inline_attributes
+        }
+
+        total_size = sum(estimate_size(value) for value in attributes.values())
+        for name, size in sorted(sizes.items(), key=lambda entry: entry[1], reverse=True):
+            if size <= self.threshold_bytes and total_size <= self.max_item_bytes:
+                break
+            del result[name]
+            result[pointer_attribute(name)] = self._put(table_name, name, attributes[name], size)
+            total_size -= size
+
+        return result
+
+    def replaced_attributes(self, attributes: Dict[str, Any], offloaded: Dict[str, Any]) -> List[str]:
+        """更新時に削除すべき属性（値とポインタのうち今回使わない方）を返す"""
+        return [
+            name if pointer_attribute(name) in offloaded else pointer_attribute(name)
+            for name in attributes
+        ]
+
+    def _put(self, table_name: str, name: str, value: Any, size: int) -> Dict[str, Any]:
+        """値をS3に書き込み、ポインタを返す"""
+        payload = encode_value(value)
+        digest = hashlib.sha256(payload).hexdigest()
+        key = f"{self.prefix}{table_name}/{digest}.json.gz"
+
+        s3_client.put_object(
+            Bucket=self.bucket_name,
+            Key=key,
+            Body=payload,
+            ContentType='application/json',
+            ContentEncoding='gzip'
+        )
+        logger.info(f"Offloaded attribute {name} ({size} bytes -> {len(payload)} bytes) to s3://{self.bucket_name}/{key}")
+
+        return {
+            'uri': f"s3://{self.bucket_name}/{key}",
+            'size': size,
+            'stored_size': len(payload),
+            'encoding': ENCODING
+        }
+
+    def rehydrate(self, item: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """ポインタになっている属性をS3から読み戻す
+
+        bucket_name / prefix の外を指すポインタは ValueError で拒否する。
+        """
+        if not item:
+            return item
+
+        result = dict(item)
+        for name, pointer in item.items():
+            if not name.startswith(OFFLOADED_PREFIX):
+                continue
+            response = s3_client.get_object(Bucket=self.bucket_name, Key=self._object_key(pointer))
+            del result[name]
+            result[name[len(OFFLOADED_PREFIX):]] = decode_value(response['Body'].read())
+        return result
+
+    def _object_key(self, pointer: Any) -> str:
+        """ポインタが指すオブジェクトキー（このポリシーの退避先以外は拒否）"""
+        location = f"s3://{self.bucket_name}/"
+        uri = pointer.get('uri') if isinstance(pointer, dict) else None
+        if not isinstance(uri, str) or not uri.startswith(location + self.prefix):
+            raise ValueError(f"Pointer outside s3://{self.bucket_name}/{self.prefix}: {uri!r}")
+        return uri[len(location):]
@@ -1,8 +1,9 @@
+import base64
 import json
 import logging
 import os
-from datetime import datetime
-from typing import Dict, Any, Optional
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterable, Optional, Tuple
 
 # ロガーの設定
 logger = logging.getLogger()
@@ -62,3 +63,67 @@ def get_query_parameter(event: Dict[str, Any], parameter_name: str) -> Optional[
     """クエリパラメータを取得"""
     query_parameters = event.get('queryStringParameters', {})
     return query_parameters.get(parameter_name) if query_parameters else None
+
+
+def get_positive_int_parameter(event: Dict[str, Any], parameter_name: str,
+                               default: Optional[int] = None) -> Optional[int]:
+    """正の整数のクエリパラメータを取得（不正な値は ValueError）"""
+    value = get_query_parameter(event, parameter_name)
+    if not value:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number <= 0:
+        raise ValueError(f'"{parameter_name}" must be a positive integer')
+    return number
+
+
+def get_limit(event: Dict[str, Any], default: int = 50, maximum: int = 100) -> int:
+    """クエリパラメータ limit を取得（最大 maximum 件に制限）"""
+    return min(get_positive_int_parameter(event, 'limit', default), maximum)
+
+
+def get_time_range(event: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    """クエリパラメータ since / until / last_minutes から時間範囲を取得"""
+    since = get_query_parameter(event, 'since')
+    until = get_query_parameter(event, 'until')
+    last_minutes = get_positive_int_parameter(event, 'last_minutes')
+
+    if last_minutes:
+        try:
+            since = (datetime.utcnow() - timedelta(minutes=last_minutes)).isoformat() + 'Z'
+        except OverflowError:
+            raise ValueError('"last_minutes" is out of range')
+
+    return since, until
+
+
+def encode_next_token(last_evaluated_key: Optional[Dict[str, Any]]) -> Optional[str]:
+    """LastEvaluatedKeyをページングトークンに変換"""
+    if not last_evaluated_key:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key, default=str).encode('utf-8')).decode('ascii')
+
+
+def decode_next_token(token: Optional[str], key_names: Optional[Iterable[str]] = None) -> Optional[Dict[str, Any]]:
+    """ページングトークンをExclusiveStartKeyに変換
+
+    key_names を指定すると、テーブルとインデックスのキー属性がちょうど揃っていることも検証する。
+    """
+    if not token:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid next_token")
+
+    # キー属性は文字列か整数のみ（それ以外はDynamoDBでValidationExceptionになる）
+    if not isinstance(key, dict) or not key or not all(
+        isinstance(value, (str, int)) and not isinstance(value, bool) for value in key.values()
+    ):
+        raise ValueError("Invalid next_token")
+    if key_names is not None and set(key) != set(key_names):
+        raise ValueError("Invalid next_token")
+    return key
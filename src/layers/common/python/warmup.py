@@ -0,0 +1,88 @@
+import os
+import time
+import logging
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger()
+
+# ウォームアップイベントとして扱うsource
+WARMUP_SOURCES = ('lambda-warmup', 'serverless-plugin-warmup')
+
+
+def is_warmup_event(event: Any) -> bool:
+    """ウォームアップ用の合成イベントかどうかを判定"""
+    if not isinstance(event, dict):
+        return False
+    return bool(event.get('warmup')) or event.get('source') in WARMUP_SOURCES
+
+
+def is_provisioned_concurrency_init() -> bool:
+    """Provisioned Concurrencyによる初期化中かどうかを判定"""
+    return os.environ.get('AWS_LAMBDA_INITIALIZATION_TYPE') == 'provisioned-concurrency'
+
+
+def warm_up(
+    db_managers: Iterable[Any] = (),
+    probes: Optional[Dict[str, Callable[[], Any]]] = None,
+    preload: Optional[Callable[[], Any]] = None
+) -> Dict[str, Any]:
+    """接続を確立してキャッシュを事前に読み込む
+
+    db_managers は DescribeTable で接続を確立する。
+    probes は安価なAPI呼び出しで、ClientError（権限不足など）でも
+    TLS接続とエンドポイント解決は完了しているため成功とみなす。
+    """
+    started = time.perf_counter()
+    results: Dict[str, str] = {}
+
+    targets: Dict[str, Callable[[], Any]] = {}
+    for db_manager in db_managers:
+        targets[f"dynamodb:{db_manager.table_name}"] = (
+            lambda manager=db_manager: manager.table.meta.client.describe_table(TableName=manager.table_name)
+        )
+    targets.update(probes or {})
+    if preload:
+        targets['preload'] = preload
+
+    for name, target in targets.items():
+        try:
+            target()
+            results[name] = 'ok'
+        except ClientError as e:
+            results[name] = f"connected ({e.response.get('Error', {}).get('Code', 'ClientError')})"
+        except Exception as e:
+            logger.warning(f"Warm-up step failed for {name}: {e}")
+            results[name] = 'failed'
+
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+    logger.info(f"Warm-up completed in {elapsed_ms}ms: {results}")
+    return {'warmed': results, 'elapsed_ms': elapsed_ms}
+
+
+def warmup_handler(
+    db_managers: Iterable[Any] = (),
+    probes: Optional[Dict[str, Callable[[], Any]]] = None,
+    preload: Optional[Callable[[], Any]] = None
+) -> Callable:
+    """ウォームアップイベントに即座に応答するハンドラーデコレーター
+
+    Provisioned Concurrencyで初期化される場合は、モジュール読み込み時に
+    同じウォームアップ処理を実行する。
+    """
+    db_managers = list(db_managers)
+
+    if is_provisioned_concurrency_init():
+        warm_up(db_managers, probes, preload)
+
+    def decorator(handler: Callable) -> Callable:
+        @wraps(handler)
+        def wrapper(event, context):
+            if is_warmup_event(event):
+                return {'statusCode': 200, 'body': warm_up(db_managers, probes, preload)}
+            return handler(event, context)
+        return wrapper
+
+    return decorator
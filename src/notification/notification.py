@@ -1,26 +1,52 @@
 import os
 import boto3
+from botocore.exceptions import ClientError
 
 from utils import (
     create_response,
     log_event,
     parse_json_body,
-    get_current_timestamp
+    get_query_parameter,
+    get_current_timestamp,
+    get_time_range,
+    get_limit,
+    encode_next_token,
+    decode_next_token
 )
-from db import DynamoDBManager
-from validators import validate_email, validate_required_fields
+from db import DynamoDBManager, BufferedWriter, BatchWriteError, is_validation_error, time_range_condition
+from validators import validate_email
+from warmup import warmup_handler
+from router import Router, timed, require_fields
 
 
 # 環境変数
 ENVIRONMENT = os.environ.get('ENVIRONMENT', 'dev')
 NOTIFICATIONS_TABLE_NAME = f"{ENVIRONMENT}-notifications"
+STATUS_INDEX_NAME = 'status-created_at-index'
+RECIPIENT_INDEX_NAME = 'recipient-created_at-index'
+# 通知記録の保持日数（expires_at によるTTL、0で無期限）
+RETENTION_DAYS = int(os.environ.get('RETENTION_DAYS', '30'))
 
 # AWS クライアント
 sns_client = boto3.client('sns')
 ses_client = boto3.client('ses')
 db_manager = DynamoDBManager(NOTIFICATIONS_TABLE_NAME)
 
+# 通知レコードは監査用のためハンドラー終了時にまとめて書き込む
+# （POST /notify は1件だけなので、レスポンス前の書き込み1回は従来と変わらない）
+audit_writer = BufferedWriter(NOTIFICATIONS_TABLE_NAME, ttl_days=RETENTION_DAYS)
 
+# ルーティングテーブル（import時に一度だけ構築）
+router = Router(middleware=[timed])
+
+
+@warmup_handler(
+    db_managers=[db_manager],
+    probes={
+        'sns': lambda: sns_client.list_topics(),
+        'ses': lambda: ses_client.get_send_quota()
+    }
+)
 def lambda_handler(event, context):
     """通知サービスのメインハンドラー"""
     log_event(event, context)
@@ -32,15 +58,23 @@ def lambda_handler(event, context):
             return handle_sns_event(event, context)
         elif 'httpMethod' in event:
             # API Gatewayイベント
-            return handle_api_request(event, context)
+            return router.dispatch(event, context)
         else:
             print("Unknown event type")
             return {'statusCode': 400, 'body': 'Unknown event type'}
 
+    except BatchWriteError:
+        # 通知を記録できなかった場合はLambdaに再試行させる
+        raise
+
     except Exception as e:
         print(f"Error in lambda_handler: {str(e)}")
         return create_response(500, {'error': 'Internal server error'})
 
+    finally:
+        # SNSイベントは handle_sns_event で書き込み済み。書き込めなかったレコードはログに出力される
+        audit_writer.flush()
+
 
 def handle_sns_event(event, context):
     """SNSイベントを処理"""
@@ -65,18 +99,16 @@ def handle_sns_event(event, context):
                 'created_at': get_current_timestamp()
             }
 
-            db_manager.put_item(notification)
-
             # メッセージを処理（例：特定のキーワードに基づいてアクション）
             if 'URGENT' in message.upper():
                 handle_urgent_notification(notification)
 
-            # 処理完了を記録
-            db_manager.update_item(
-                {'id': notification['id']},
-                {'status': 'processed', 'processed_at': get_current_timestamp()}
-            )
+            # 処理完了を記録（書き込みはハンドラー終了時にまとめて実行）
+            notification['status'] = 'processed'
+            notification['processed_at'] = get_current_timestamp()
+            audit_writer.add(notification)
 
+        audit_writer.flush(raise_on_failure=True)
         return {'statusCode': 200, 'body': 'SNS events processed successfully'}
 
     except Exception as e:
@@ -84,21 +116,13 @@ def handle_sns_event(event, context):
         raise
 
 
+@router.route('/notify', ['POST'], middleware=[require_fields('recipient', 'subject', 'message', 'channel')])
 def handle_api_request(event, context):
     """APIリクエストを処理して通知を送信"""
     try:
-        # リクエストボディをパース
+        # リクエストボディをパース（必須フィールドはミドルウェアで検証済み）
         body = parse_json_body(event)
 
-        # バリデーション
-        is_valid, missing = validate_required_fields(
-            body,
-            ['recipient', 'subject', 'message', 'channel']
-        )
-
-        if not is_valid:
-            return create_response(400, {'error': f'Missing required fields: {", ".join(missing)}'})
-
         recipient = body['recipient']
         subject = body['subject']
         message = body['message']
@@ -130,7 +154,7 @@ def handle_api_request(event, context):
         if not result['success']:
             notification['error'] = result.get('error', 'Unknown error')
 
-        db_manager.put_item(notification)
+        audit_writer.add(notification)
 
         return create_response(
             200 if result['success'] else 500,
@@ -146,6 +170,55 @@ def handle_api_request(event, context):
         return create_response(500, {'error': 'Failed to send notification'})
 
 
+@router.route('/notifications', ['GET'])
+def list_notifications(event, context):
+    """宛先またはステータスと作成日時の範囲で通知を検索（GSIを使用）"""
+    try:
+        recipient = get_query_parameter(event, 'recipient')
+        status = get_query_parameter(event, 'status')
+        if recipient:
+            index_name, partition_name, partition_value = RECIPIENT_INDEX_NAME, 'recipient', recipient
+        elif status:
+            index_name, partition_name, partition_value = STATUS_INDEX_NAME, 'status', status
+        else:
+            return create_response(400, {'error': 'Query parameter "recipient" or "status" is required'})
+
+        try:
+            since, until = get_time_range(event)
+            start_key = decode_next_token(
+                get_query_parameter(event, 'next_token'),
+                key_names=('id', partition_name, 'created_at')
+            )
+            limit = get_limit(event)
+        except ValueError as e:
+            return create_response(400, {'error': str(e)})
+
+        # 新しい順に1ページ分だけ取得
+        try:
+            notifications, last_key = db_manager.query_page(
+                time_range_condition(partition_name, partition_value, since=since, until=until),
+                index_name=index_name,
+                limit=limit,
+                exclusive_start_key=start_key,
+                scan_forward=False
+            )
+        except ClientError as e:
+            # トークンのキーが検索条件（パーティションや時間範囲）と合わない場合
+            if start_key and is_validation_error(e):
+                return create_response(400, {'error': 'Invalid next_token'})
+            raise
+
+        return create_response(200, {
+            'notifications': notifications,
+            'count': len(notifications),
+            'next_token': encode_next_token(last_key)
+        })
+
+    except Exception as e:
+        print(f"Error listing notifications: {str(e)}")
+        return create_response(500, {'error': 'Failed to list notifications'})
+
+
 def send_email_notification(recipient, subject, message):
     """メール通知を送信"""
     try:
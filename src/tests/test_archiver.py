@@ -0,0 +1,146 @@
+import unittest
+import gzip
+import json
+import sys
+import os
+from unittest.mock import patch, Mock
+from moto import mock_aws
+import boto3
+
+# テスト用の環境変数設定
+os.environ['ENVIRONMENT'] = 'test'
+os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
+os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
+os.environ['AWS_SECURITY_TOKEN'] = 'testing'
+os.environ['AWS_SESSION_TOKEN'] = 'testing'
+os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
+os.environ['DATA_BUCKET_NAME'] = 'test-data-bucket'
+
+# テスト対象モジュールをインポート
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'archiver'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'layers', 'common', 'python'))
+
+import archiver
+from archiver import lambda_handler
+from memory import MemoryBudget
+
+STREAM_ARN = 'arn:aws:dynamodb:us-east-1:123456789012:table/test-notifications/stream/2024-07-09T00:00:00.000'
+
+
+def removal_record(item_id, created_at, ttl=True):
+    """削除レコードを作成（ttl=Falseならユーザーによる削除）"""
+    record = {
+        'eventName': 'REMOVE',
+        'eventSourceARN': STREAM_ARN,
+        'dynamodb': {
+            'SequenceNumber': f'seq-{item_id}',
+            'OldImage': {
+                'id': {'S': item_id},
+                'created_at': {'S': created_at},
+                'expires_at': {'N': '1720000000'}
+            }
+        }
+    }
+    if ttl:
+        record['userIdentity'] = {'type': 'Service', 'principalId': 'dynamodb.amazonaws.com'}
+    return record
+
+
+@mock_aws
+class TestArchiver(unittest.TestCase):
+    """アーカイブ機能のテストクラス"""
+
+    def setUp(self):
+        """テスト前の準備"""
+        self.s3 = boto3.client('s3', region_name='us-east-1')
+        self.s3.create_bucket(Bucket='test-data-bucket')
+        self.context = Mock()
+
+    def test_archives_ttl_removals_by_date(self):
+        """TTL削除がテーブル・日付ごとに圧縮して保存されることのテスト"""
+        event = {'Records': [
+            removal_record('n1', '2024-07-09T12:00:00Z'),
+            removal_record('n2', '2024-07-09T13:00:00Z'),
+            removal_record('n3', '2024-07-10T01:00:00Z'),
+            removal_record('n4', '2024-07-10T02:00:00Z', ttl=False)
+        ]}
+
+        response = lambda_handler(event, self.context)
+
+        self.assertEqual(response['body'], 'Archived 3 records')
+        objects = self.s3.list_objects_v2(Bucket='test-data-bucket')['Contents']
+        keys = sorted(obj['Key'] for obj in objects)
+        self.assertEqual(len(keys), 2)
+        self.assertTrue(keys[0].startswith('archive/test-notifications/year=2024/month=07/day=09/'))
+        self.assertTrue(keys[1].startswith('archive/test-notifications/year=2024/month=07/day=10/'))
+
+        body = self.s3.get_object(Bucket='test-data-bucket', Key=keys[0])['Body'].read()
+        lines = gzip.decompress(body).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], ['n1', 'n2'])
+        self.assertEqual(json.loads(lines[0])['expires_at'], 1720000000)
+
+    def test_offloaded_attributes_are_archived_inline(self):
+        """S3に退避された属性が読み戻されてアーカイブに含まれることのテスト"""
+        pointer = archiver.S3OffloadPolicy('test-data-bucket', prefix='job-payloads/', threshold_bytes=10) \
+            .offload_attributes('test-processed-data', {'id': 'j1', 'data': 'x' * 100})['_offloaded_data']
+        record = removal_record('j1', '2024-07-09T12:00:00Z')
+        record['dynamodb']['OldImage']['_offloaded_data'] = {'M': {
+            'uri': {'S': pointer['uri']},
+            'size': {'N': str(pointer['size'])},
+            'stored_size': {'N': str(pointer['stored_size'])},
+            'encoding': {'S': pointer['encoding']}
+        }}
+
+        lambda_handler({'Records': [record]}, self.context)
+
+        keys = [obj['Key'] for obj in self.s3.list_objects_v2(Bucket='test-data-bucket', Prefix='archive/')['Contents']]
+        body = self.s3.get_object(Bucket='test-data-bucket', Key=keys[0])['Body'].read()
+        archived = json.loads(gzip.decompress(body))
+        self.assertEqual(archived['data'], 'x' * 100)
+        self.assertNotIn('_offloaded_data', archived)
+
+    def test_corrupt_payload_keeps_pointer(self):
+        """復元できないペイロードがあってもそのレコードだけ参照のまま保存されることのテスト"""
+        self.s3.put_object(Bucket='test-data-bucket', Key='job-payloads/test-processed-data/bad.json.gz',
+                           Body=b'not gzip')
+        broken = removal_record('j1', '2024-07-09T12:00:00Z')
+        broken['dynamodb']['OldImage']['_offloaded_data'] = {'M': {
+            'uri': {'S': 's3://test-data-bucket/job-payloads/test-processed-data/bad.json.gz'}
+        }}
+        event = {'Records': [broken, removal_record('j2', '2024-07-09T13:00:00Z')]}
+
+        response = lambda_handler(event, self.context)
+
+        self.assertEqual(response['body'], 'Archived 2 records')
+        self.assertNotIn('batchItemFailures', response)
+        keys = [obj['Key'] for obj in self.s3.list_objects_v2(Bucket='test-data-bucket', Prefix='archive/')['Contents']]
+        body = self.s3.get_object(Bucket='test-data-bucket', Key=keys[0])['Body'].read()
+        archived = [json.loads(line) for line in gzip.decompress(body).decode('utf-8').splitlines()]
+        self.assertEqual(archived[0]['_offloaded_data']['uri'],
+                         's3://test-data-bucket/job-payloads/test-processed-data/bad.json.gz')
+        self.assertEqual(archived[1]['id'], 'j2')
+
+    def test_large_partition_is_written_early(self):
+        """パーティションが上限サイズに達した時点で書き出されることのテスト"""
+        event = {'Records': [removal_record(f'n{i}', '2024-07-09T12:00:00Z') for i in range(5)]}
+
+        with patch.object(archiver, 'PARTITION_MAX_BYTES', 1):
+            response = lambda_handler(event, self.context)
+
+        self.assertEqual(response['body'], 'Archived 5 records')
+        objects = self.s3.list_objects_v2(Bucket='test-data-bucket', Prefix='archive/')['Contents']
+        self.assertEqual(len(objects), 5)
+
+    def test_memory_pressure_reports_remaining_records(self):
+        """メモリ上限に達した場合に残りのレコードだけを再試行させることのテスト"""
+        event = {'Records': [removal_record(f'n{i}', '2024-07-09T12:00:00Z') for i in range(5)]}
+
+        with patch.object(archiver, 'memory_budget', MemoryBudget(limit_mb=1, check_every=2)):
+            response = lambda_handler(event, self.context)
+
+        self.assertEqual(response['body'], 'Archived 2 records')
+        self.assertEqual(response['batchItemFailures'], [{'itemIdentifier': 'seq-n2'}])
+
+
+if __name__ == '__main__':
+    unittest.main()
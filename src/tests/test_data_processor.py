@@ -0,0 +1,258 @@
+import unittest
+import base64
+import json
+import sys
+import os
+from unittest.mock import patch, Mock
+from moto import mock_aws
+import boto3
+from botocore.exceptions import ClientError
+
+# テスト用の環境変数設定
+os.environ['ENVIRONMENT'] = 'test'
+os.environ['LOG_LEVEL'] = 'DEBUG'
+os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
+os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
+os.environ['AWS_SECURITY_TOKEN'] = 'testing'
+os.environ['AWS_SESSION_TOKEN'] = 'testing'
+os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
+os.environ['DATA_BUCKET_NAME'] = 'test-data-bucket'
+
+# テスト対象モジュールをインポート
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'data_processor'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'layers', 'common', 'python'))
+
+import data_processor
+from data_processor import lambda_handler
+from db import BatchWriteError
+
+
+def s3_event(key):
+    """S3イベントを作成"""
+    return {'Records': [{
+        'eventName': 'ObjectCreated:Put',
+        's3': {'bucket': {'name': 'test-data-bucket'}, 'object': {'key': key}}
+    }]}
+
+
+@mock_aws
+class TestDataProcessor(unittest.TestCase):
+    """データ処理機能のテストクラス"""
+
+    def setUp(self):
+        """テスト前の準備"""
+        dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+        self.table = dynamodb.create_table(
+            TableName='test-processed-data',
+            KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[
+                {'AttributeName': 'id', 'AttributeType': 'S'},
+                {'AttributeName': 'status', 'AttributeType': 'S'},
+                {'AttributeName': 'created_at', 'AttributeType': 'S'}
+            ],
+            GlobalSecondaryIndexes=[{
+                'IndexName': 'status-created_at-index',
+                'KeySchema': [
+                    {'AttributeName': 'status', 'KeyType': 'HASH'},
+                    {'AttributeName': 'created_at', 'KeyType': 'RANGE'}
+                ],
+                'Projection': {'ProjectionType': 'ALL'}
+            }],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        self.s3 = boto3.client('s3', region_name='us-east-1')
+        self.s3.create_bucket(Bucket='test-data-bucket')
+
+        self.context = Mock()
+        self.context.request_id = 'test-request-id'
+        self.context.function_name = 'test-data-processor'
+
+    def create_upload(self, **body):
+        """アップロードURL発行APIを呼び出す"""
+        event = {'httpMethod': 'POST', 'resource': '/uploads', 'body': json.dumps(body)}
+        return lambda_handler(event, self.context)
+
+    def test_create_single_upload(self):
+        """単一PUT用URL発行のテスト"""
+        response = self.create_upload(filename='report data.csv', size=1024, content_type='text/csv')
+
+        self.assertEqual(response['statusCode'], 201)
+        body = json.loads(response['body'])
+        self.assertEqual(body['method'], 'PUT')
+        self.assertEqual(body['key'], f"uploads/{body['job_id']}/report_data.csv")
+        self.assertIn('X-Amz-Signature', body['url'])
+
+        job = self.table.get_item(Key={'id': body['job_id']})['Item']
+        self.assertEqual(job['status'], 'awaiting_upload')
+        self.assertNotIn('data', job)
+
+    def test_create_upload_validation(self):
+        """不正なリクエストのテスト"""
+        self.assertEqual(self.create_upload(size=10)['statusCode'], 400)
+        self.assertEqual(self.create_upload(filename='a.bin', size=-1)['statusCode'], 400)
+        self.assertEqual(self.create_upload(filename='a.bin', size=10 ** 15)['statusCode'], 413)
+
+    @patch.object(data_processor, 'MULTIPART_THRESHOLD_BYTES', 1024)
+    @patch.object(data_processor, 'MULTIPART_PART_SIZE_BYTES', 1024)
+    def test_multipart_upload_flow(self):
+        """マルチパートアップロードからS3イベント処理までのテスト"""
+        response = self.create_upload(filename='big.bin', size=2048)
+        body = json.loads(response['body'])
+        self.assertEqual(body['method'], 'MULTIPART')
+        self.assertEqual(len(body['parts']), 2)
+
+        # クライアントの代わりにパートをアップロード
+        part = self.s3.upload_part(
+            Bucket='test-data-bucket', Key=body['key'], UploadId=body['upload_id'],
+            PartNumber=1, Body=b'x' * 2048
+        )
+        event = {
+            'httpMethod': 'POST',
+            'resource': '/uploads/{id}/complete',
+            'pathParameters': {'id': body['job_id']},
+            'body': json.dumps({'parts': [{'part_number': 1, 'etag': part['ETag']}]})
+        }
+        self.assertEqual(lambda_handler(event, self.context)['statusCode'], 200)
+
+        # S3トリガーでジョブが完了する
+        lambda_handler(s3_event(body['key']), self.context)
+
+        job = self.table.get_item(Key={'id': body['job_id']})['Item']
+        self.assertEqual(job['status'], 'completed')
+        self.assertEqual(job['file_size'], 2048)
+        self.assertEqual(job['uri'], f"s3://test-data-bucket/{body['key']}")
+        self.assertTrue(job['digest'])
+        # 発行時の属性と作成日時は保持される
+        self.assertEqual(job['type'], 'upload')
+        self.assertEqual(job['upload_id'], body['upload_id'])
+        self.assertEqual(job['expected_size'], 2048)
+        self.assertLess(job['created_at'], job['completed_at'])
+
+    def test_upload_size_mismatch_is_flagged(self):
+        """申告と異なるサイズのアップロードが失敗として記録されることのテスト"""
+        body = json.loads(self.create_upload(filename='small.bin', size=100)['body'])
+        self.s3.put_object(Bucket='test-data-bucket', Key=body['key'], Body=b'x' * 50)
+
+        lambda_handler(s3_event(body['key']), self.context)
+
+        job = self.table.get_item(Key={'id': body['job_id']})['Item']
+        self.assertEqual(job['status'], 'failed')
+        self.assertTrue(job['size_mismatch'])
+        self.assertEqual(job['file_size'], 50)
+        self.assertEqual(job['expected_size'], 100)
+
+    def test_s3_event_decodes_key(self):
+        """URLエンコードされたキーのS3イベント処理テスト"""
+        self.s3.put_object(Bucket='test-data-bucket', Key='uploads/my file.json', Body=b'{}')
+
+        lambda_handler(s3_event('uploads/my+file.json'), self.context)
+
+        job = self.table.get_item(Key={'id': 'test-request-id'})['Item']
+        self.assertEqual(job['status'], 'completed')
+        self.assertEqual(job['key'], 'uploads/my file.json')
+
+    def test_s3_event_fails_when_job_cannot_be_recorded(self):
+        """ジョブを記録できない場合にLambdaへ失敗を返し、バッファを持ち越さないことのテスト"""
+        self.s3.put_object(Bucket='test-data-bucket', Key='imports/data.json', Body=b'{}')
+        client = data_processor.job_writer.client
+
+        with patch.object(client, 'batch_write_item', side_effect=ClientError(
+                {'Error': {'Code': 'InternalServerError', 'Message': 'boom'}}, 'BatchWriteItem')):
+            with self.assertRaises(BatchWriteError):
+                lambda_handler(s3_event('imports/data.json'), self.context)
+
+        self.assertEqual(len(data_processor.job_writer), 0)
+
+    def test_large_payload_is_offloaded(self):
+        """大きなデータがS3に退避され、読み取り時に復元されることのテスト"""
+        data = 'x' * (64 * 1024)
+        event = {'httpMethod': 'POST', 'resource': '/process', 'body': json.dumps({'data': data})}
+
+        response = lambda_handler(event, self.context)
+
+        self.assertEqual(response['statusCode'], 200)
+        raw_job = self.table.get_item(Key={'id': 'test-request-id'})['Item']
+        self.assertNotIn('data', raw_job)
+        pointer = raw_job['_offloaded_data']
+        self.assertTrue(pointer['uri'].startswith('s3://test-data-bucket/job-payloads/'))
+        self.assertEqual(pointer['size'], len(data))
+        self.assertLess(pointer['stored_size'], 1024)
+
+        job = data_processor.db_manager.get_item({'id': 'test-request-id'})
+        self.assertEqual(job['data'], data)
+        self.assertEqual(job['status'], 'completed')
+
+    def test_small_payload_stays_inline(self):
+        """小さなデータはアイテム内に保存されることのテスト"""
+        event = {'httpMethod': 'POST', 'resource': '/process', 'body': json.dumps({'data': 'hello world'})}
+
+        lambda_handler(event, self.context)
+
+        raw_job = self.table.get_item(Key={'id': 'test-request-id'})['Item']
+        self.assertEqual(raw_job['data'], 'hello world')
+
+    def test_pointer_like_payload_is_stored_verbatim(self):
+        """ポインタを装ったデータがS3から読み戻されずにそのまま返ることのテスト"""
+        data = {'uri': 's3://other-bucket/secret.json.gz', '__s3__': 's3://other-bucket/secret.json.gz'}
+        event = {'httpMethod': 'POST', 'resource': '/process', 'body': json.dumps({'data': data})}
+
+        lambda_handler(event, self.context)
+
+        job = data_processor.db_manager.get_item({'id': 'test-request-id'})
+        self.assertEqual(job['data'], data)
+
+    def test_list_jobs_by_status_and_time(self):
+        """ステータスと時間範囲でのジョブ検索テスト"""
+        for i, status in enumerate(['failed', 'failed', 'completed', 'failed']):
+            self.table.put_item(Item={
+                'id': f'job-{i}',
+                'status': status,
+                'created_at': f'2024-07-09T12:0{i}:00Z'
+            })
+
+        event = {
+            'httpMethod': 'GET',
+            'resource': '/jobs',
+            'queryStringParameters': {'status': 'failed', 'since': '2024-07-09T12:01:00Z', 'limit': '1'}
+        }
+        response = lambda_handler(event, self.context)
+
+        self.assertEqual(response['statusCode'], 200)
+        body = json.loads(response['body'])
+        self.assertEqual([job['id'] for job in body['jobs']], ['job-3'])
+        self.assertIsNotNone(body['next_token'])
+
+        # 次のページ
+        event['queryStringParameters']['next_token'] = body['next_token']
+        body = json.loads(lambda_handler(event, self.context)['body'])
+        self.assertEqual([job['id'] for job in body['jobs']], ['job-1'])
+
+    def test_list_jobs_rejects_token_for_other_status(self):
+        """検索条件と合わないトークンでDynamoDBが拒否した場合に400になることのテスト"""
+        token = base64.urlsafe_b64encode(json.dumps(
+            {'id': 'job-0', 'status': 'completed', 'created_at': '2024-07-09T12:00:00Z'}
+        ).encode('utf-8')).decode('ascii')
+        event = {
+            'httpMethod': 'GET',
+            'resource': '/jobs',
+            'queryStringParameters': {'status': 'failed', 'next_token': token}
+        }
+        # motoは開始キーとパーティションの不一致を検証しないため、DynamoDBの応答を再現する
+        error = ClientError({'Error': {'Code': 'ValidationException', 'Message': 'Invalid ExclusiveStartKey'}}, 'Query')
+
+        with patch.object(data_processor.db_manager.table, 'query', side_effect=error):
+            response = lambda_handler(event, self.context)
+
+        self.assertEqual(response['statusCode'], 400)
+
+    def test_list_jobs_requires_status(self):
+        """statusが無い場合のテスト"""
+        event = {'httpMethod': 'GET', 'resource': '/jobs', 'queryStringParameters': None}
+
+        response = lambda_handler(event, self.context)
+
+        self.assertEqual(response['statusCode'], 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,280 @@
+import unittest
+import subprocess
+import sys
+import os
+from decimal import Decimal
+from moto import mock_aws
+import boto3
+from botocore.exceptions import ClientError
+from boto3.dynamodb.conditions import Attr
+
+# テスト用の環境変数設定
+os.environ['ENVIRONMENT'] = 'test'
+os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
+os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
+os.environ['AWS_SECURITY_TOKEN'] = 'testing'
+os.environ['AWS_SESSION_TOKEN'] = 'testing'
+os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
+
+# テスト対象モジュールをインポート
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'layers', 'common', 'python'))
+
+from db import DynamoDBManager, UpdateExpressionBuilder, BufferedWriter, BatchWriteError, is_conditional_check_failed
+from storage import S3OffloadPolicy, encode_value, decode_value
+
+LAYER_DIR = os.path.join(os.path.dirname(__file__), '..', 'layers', 'common', 'python')
+
+
+class TestUpdateExpressionBuilder(unittest.TestCase):
+    """UpdateExpressionBuilderのテストクラス"""
+
+    def test_build_uses_placeholders_for_reserved_words(self):
+        """予約語がプレースホルダー経由で参照されることのテスト"""
+        params = UpdateExpressionBuilder().set('status', 'done').set('data', 'x').build()
+
+        self.assertEqual(params['UpdateExpression'], 'SET #f0 = :u0, #f1 = :u1')
+        self.assertEqual(params['ExpressionAttributeNames'], {'#f0': 'status', '#f1': 'data'})
+        self.assertEqual(params['ExpressionAttributeValues'], {':u0': 'done', ':u1': 'x'})
+
+    def test_build_combines_clauses(self):
+        """SET / ADD / REMOVE を組み合わせたテスト"""
+        params = (
+            UpdateExpressionBuilder()
+            .set_if_not_exists('created_at', 't0')
+            .add('count', 1)
+            .remove('error')
+            .build()
+        )
+
+        self.assertEqual(
+            params['UpdateExpression'],
+            'SET #f0 = if_not_exists(#f0, :u0) ADD #f1 :u1 REMOVE #f2'
+        )
+
+    def test_build_empty_raises(self):
+        """空のビルダーはエラーになることのテスト"""
+        with self.assertRaises(ValueError):
+            UpdateExpressionBuilder().build()
+
+
+@mock_aws
+class TestDynamoDBManagerUpdate(unittest.TestCase):
+    """DynamoDBManager.update_itemのテストクラス"""
+
+    def setUp(self):
+        """テスト前の準備"""
+        dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+        self.table = dynamodb.create_table(
+            TableName='test-items',
+            KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        self.table.put_item(Item={'id': 'item-1', 'status': 'queued', 'version': 1})
+        self.db_manager = DynamoDBManager('test-items')
+
+    def test_update_reserved_words(self):
+        """予約語フィールドの更新テスト"""
+        result = self.db_manager.update_item({'id': 'item-1'}, {'status': 'completed', 'data': 'abc'})
+
+        self.assertEqual(result['status'], 'completed')
+        self.assertEqual(result['data'], 'abc')
+
+    def test_increment_is_atomic_counter(self):
+        """アトミックカウンターのテスト"""
+        self.db_manager.increment({'id': 'item-1'}, 'hits')
+        result = self.db_manager.increment({'id': 'item-1'}, 'hits', 2)
+
+        self.assertEqual(result['hits'], 3)
+
+    def test_conditional_update(self):
+        """楽観的排他制御のテスト"""
+        builder = UpdateExpressionBuilder().add('version', 1)
+        result = self.db_manager.update_item(
+            {'id': 'item-1'},
+            {'status': 'processing'},
+            builder=builder,
+            condition=Attr('version').eq(1)
+        )
+        self.assertEqual(result['version'], 2)
+
+        with self.assertRaises(ClientError) as cm:
+            self.db_manager.update_item(
+                {'id': 'item-1'},
+                {'status': 'stale'},
+                condition=Attr('version').eq(1)
+            )
+        self.assertTrue(is_conditional_check_failed(cm.exception))
+
+    def test_condition_placeholder_collision_is_rejected(self):
+        """条件のプレースホルダーが更新式と重複した場合に拒否されることのテスト"""
+        with self.assertRaises(ValueError):
+            self.db_manager.update_item(
+                {'id': 'item-1'},
+                {'status': 'processing'},
+                condition='#f0 = :u0',
+                condition_names={'#f0': 'owner'},
+                condition_values={':u0': 'alice'}
+            )
+
+        # 別名のプレースホルダーはそのまま使える
+        result = self.db_manager.update_item(
+            {'id': 'item-1'},
+            {'status': 'processing'},
+            condition='attribute_not_exists(#owner) OR #owner = :owner',
+            condition_names={'#owner': 'owner'},
+            condition_values={':owner': 'alice'}
+        )
+        self.assertEqual(result['status'], 'processing')
+
+    def test_return_values(self):
+        """ReturnValuesの指定テスト"""
+        result = self.db_manager.update_item({'id': 'item-1'}, {'status': 'done'}, return_values='UPDATED_OLD')
+
+        self.assertEqual(result, {'status': 'queued'})
+
+
+@mock_aws
+class TestBufferedWriter(unittest.TestCase):
+    """BufferedWriterのテストクラス"""
+
+    def setUp(self):
+        """テスト前の準備"""
+        dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+        self.table = dynamodb.create_table(
+            TableName='test-audit',
+            KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+
+    def test_flush_writes_buffered_records(self):
+        """バッファしたレコードがflushで書き込まれることのテスト"""
+        writer = BufferedWriter('test-audit')
+        for i in range(30):
+            writer.add({'id': f'record-{i}', 'status': 'sent'})
+        # 25件に達した時点で自動的に書き込まれる
+        self.assertEqual(len(writer), 5)
+
+        result = writer.flush()
+
+        self.assertEqual(result, {'written': 5, 'failed': []})
+        self.assertEqual(len(writer), 0)
+        self.assertEqual(self.table.scan()['Count'], 30)
+
+    def test_same_key_is_deduplicated(self):
+        """同じキーのレコードは後勝ちになることのテスト"""
+        with BufferedWriter('test-audit') as writer:
+            writer.add({'id': 'record-1', 'status': 'received'})
+            writer.add({'id': 'record-1', 'status': 'processed'})
+
+        item = self.table.get_item(Key={'id': 'record-1'})['Item']
+        self.assertEqual(item['status'], 'processed')
+
+    def test_failed_records_are_reported(self):
+        """書き込みに失敗したレコードが結果で報告され、次の呼び出しへ持ち越されないことのテスト"""
+        writer = BufferedWriter('missing-table')
+        writer.add({'id': 'record-1'})
+
+        result = writer.flush()
+
+        self.assertEqual(result['written'], 0)
+        self.assertEqual(result['failed'], [{'id': 'record-1'}])
+        self.assertEqual(len(writer), 0)
+
+    def test_flush_raises_on_failure(self):
+        """raise_on_failure 指定時に、しきい値到達時の失敗も含めて例外になることのテスト"""
+        writer = BufferedWriter('missing-table', flush_threshold=2)
+        for i in range(3):
+            writer.add({'id': f'record-{i}'})
+
+        with self.assertRaises(BatchWriteError) as cm:
+            writer.flush(raise_on_failure=True)
+
+        self.assertEqual(len(cm.exception.failed), 3)
+        self.assertEqual(writer.flush(), {'written': 0, 'failed': []})
+
+
+@mock_aws
+class TestS3OffloadPolicy(unittest.TestCase):
+    """S3OffloadPolicyのテストクラス"""
+
+    def setUp(self):
+        """テスト前の準備"""
+        dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+        self.table = dynamodb.create_table(
+            TableName='test-jobs',
+            KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket='test-bucket')
+        self.policy = S3OffloadPolicy('test-bucket', prefix='payloads/', threshold_bytes=10)
+        self.manager = DynamoDBManager('test-jobs', offload=self.policy)
+
+    def test_update_replaces_pointer_with_inline_value(self):
+        """更新で値がインラインに戻ると古いポインタが削除されることのテスト"""
+        self.manager.put_item({'id': 'j1', 'data': 'x' * 100})
+        self.assertIn('_offloaded_data', self.table.get_item(Key={'id': 'j1'})['Item'])
+
+        self.manager.update_item({'id': 'j1'}, {'data': 'small'})
+
+        raw = self.table.get_item(Key={'id': 'j1'})['Item']
+        self.assertEqual(raw['data'], 'small')
+        self.assertNotIn('_offloaded_data', raw)
+        self.assertEqual(self.manager.get_item({'id': 'j1'})['data'], 'small')
+
+    def test_reserved_attribute_names_are_rejected(self):
+        """予約済みの属性名を含む入力が拒否されることのテスト"""
+        with self.assertRaises(ValueError):
+            self.manager.put_item({'id': 'j1', '_offloaded_data': {'uri': 's3://test-bucket/payloads/x'}})
+
+    def test_pointer_outside_prefix_is_rejected(self):
+        """退避先以外を指すポインタは読み戻さないことのテスト"""
+        for uri in ('s3://other-bucket/payloads/x.json.gz', 's3://test-bucket/secrets/x.json.gz'):
+            with self.assertRaises(ValueError):
+                self.policy.rehydrate({'id': 'j1', '_offloaded_data': {'uri': uri}})
+
+
+class TestStorageEncoding(unittest.TestCase):
+    """オフロード時のエンコードのテストクラス"""
+
+    def test_round_trip_keeps_dynamodb_types(self):
+        """セット・バイナリ・数値が元の型で復元されることのテスト"""
+        value = {
+            'tags': {'a', 'b'},
+            'scores': {Decimal('1'), Decimal('2')},
+            'blob': b'\x00\xff',
+            'ratio': Decimal('0.25'),
+            'precise': Decimal('0.1234567890123456789012345678901234567'),
+            'big': Decimal('12345678901234567890123456789012345678'),
+            'nested': [{'count': Decimal('3')}]
+        }
+
+        decoded = decode_value(encode_value(value))
+
+        self.assertEqual(decoded, value)
+        self.assertEqual({type(number) for number in decoded['scores']}, {Decimal})
+        self.assertIsInstance(decoded['ratio'], Decimal)
+        self.assertEqual(str(decoded['precise']), '0.1234567890123456789012345678901234567')
+        self.assertIsInstance(decoded['big'], Decimal)
+        self.assertIsInstance(decoded['nested'][0]['count'], Decimal)
+
+    def test_unsupported_type_is_rejected(self):
+        """DynamoDBに無い型は黙って文字列化せずに拒否することのテスト"""
+        with self.assertRaises(TypeError):
+            encode_value({'when': object()})
+
+    def test_db_does_not_import_storage(self):
+        """dbの読み込みでS3クライアントが作成されないことのテスト"""
+        code = (
+            f"import sys; sys.path.insert(0, {LAYER_DIR!r}); import db; "
+            "sys.exit('storage' in sys.modules)"
+        )
+        result = subprocess.run([sys.executable, '-c', code], env=os.environ.copy())
+
+        self.assertEqual(result.returncode, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+import json
+import sys
+import os
+from unittest.mock import Mock
+from moto import mock_aws
+import boto3
+
+# テスト用の環境変数設定
+os.environ['ENVIRONMENT'] = 'test'
+os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
+os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
+os.environ['AWS_SECURITY_TOKEN'] = 'testing'
+os.environ['AWS_SESSION_TOKEN'] = 'testing'
+os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
+os.environ['DATA_BUCKET_NAME'] = 'test-data-bucket'
+
+# テスト対象モジュールをインポート
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'health_check'))
+
+import health_check
+from health_check import lambda_handler
+
+
+@mock_aws
+class TestHealthCheck(unittest.TestCase):
+    """ヘルスチェック機能のテストクラス"""
+
+    def setUp(self):
+        """テスト前の準備"""
+        health_check.probe_cache['results'] = None
+        health_check.probe_cache['expires_at'] = 0.0
+
+        dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+        for table_name in health_check.TABLE_NAMES:
+            dynamodb.create_table(
+                TableName=table_name,
+                KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+                AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+                BillingMode='PAY_PER_REQUEST'
+            )
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket='test-data-bucket')
+
+        self.context = Mock()
+        self.context.request_id = 'test-request-id'
+
+    def test_shallow_check(self):
+        """依存先をプローブしない通常チェックのテスト"""
+        response = lambda_handler({}, self.context)
+
+        self.assertEqual(response['statusCode'], 200)
+        body = json.loads(response['body'])
+        self.assertEqual(body['status'], 'healthy')
+        self.assertNotIn('dependencies', body)
+
+    def test_deep_check_reports_latency(self):
+        """ディープチェックで依存先ごとのレイテンシが返ることのテスト"""
+        event = {'queryStringParameters': {'deep': '1'}}
+
+        response = lambda_handler(event, self.context)
+
+        self.assertEqual(response['statusCode'], 200)
+        body = json.loads(response['body'])
+        self.assertFalse(body['cached'])
+        self.assertEqual(len(body['dependencies']), len(health_check.TABLE_NAMES) + 1)
+        for result in body['dependencies'].values():
+            self.assertEqual(result['status'], 'healthy')
+            self.assertIn('latency_ms', result)
+
+    def test_deep_check_is_cached(self):
+        """TTL内はキャッシュされた結果が返ることのテスト"""
+        event = {'queryStringParameters': {'deep': '1'}}
+        lambda_handler(event, self.context)
+
+        response = lambda_handler(event, self.context)
+
+        self.assertTrue(json.loads(response['body'])['cached'])
+
+    def test_deep_check_unhealthy_dependency(self):
+        """依存先が存在しない場合に503が返ることのテスト"""
+        boto3.client('dynamodb', region_name='us-east-1').delete_table(TableName='test-users')
+        event = {'queryStringParameters': {'deep': '1'}}
+
+        response = lambda_handler(event, self.context)
+
+        self.assertEqual(response['statusCode'], 503)
+        body = json.loads(response['body'])
+        self.assertEqual(body['status'], 'unhealthy')
+        self.assertEqual(body['dependencies']['dynamodb:test-users']['status'], 'unhealthy')
+
+
+if __name__ == '__main__':
+    unittest.main()
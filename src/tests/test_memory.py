@@ -0,0 +1,66 @@
+import unittest
+import sys
+import os
+import tracemalloc
+
+# テスト対象モジュールをインポート
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'layers', 'common', 'python'))
+
+from memory import MemoryBudget, MemoryBudgetExceeded, read_rss_bytes
+
+
+class TestMemoryBudget(unittest.TestCase):
+    """MemoryBudgetのテストクラス"""
+
+    def test_read_rss(self):
+        """RSSが取得できることのテスト"""
+        self.assertGreater(read_rss_bytes(), 0)
+
+    def test_iterate_within_budget(self):
+        """上限に余裕がある場合は全件処理されることのテスト"""
+        budget = MemoryBudget(limit_mb=1024 * 1024, check_every=2)
+
+        self.assertEqual(list(budget.iterate(range(10))), list(range(10)))
+        self.assertGreater(budget.peak_bytes, 0)
+        self.assertEqual(budget.pressure_events, 0)
+
+    def test_iterate_applies_backpressure(self):
+        """上限を超えた場合に解放処理を呼んでから例外を送出することのテスト"""
+        budget = MemoryBudget(limit_mb=1, check_every=3)
+        flushed = []
+        processed = []
+
+        with self.assertRaises(MemoryBudgetExceeded):
+            for item in budget.iterate(range(10), on_pressure=lambda: flushed.append(True)):
+                processed.append(item)
+
+        self.assertEqual(processed, [0, 1, 2])
+        self.assertEqual(flushed, [True])
+
+    def test_profile_resets_peak(self):
+        """profileデコレーターが呼び出しごとに統計をリセットすることのテスト"""
+        budget = MemoryBudget(limit_mb=1024 * 1024)
+        budget.pressure_events = 5
+
+        @budget.profile
+        def handler(event, context):
+            return 'ok'
+
+        self.assertEqual(handler({}, None), 'ok')
+        self.assertEqual(budget.pressure_events, 0)
+        self.assertGreater(budget.peak_bytes, 0)
+
+    def test_tracemalloc_mode(self):
+        """tracemallocによる計測のテスト"""
+        budget = MemoryBudget(limit_mb=1024 * 1024, use_tracemalloc=True)
+        budget.reset()
+        try:
+            data = [bytes(1024) for _ in range(1000)]
+            self.assertGreater(budget.usage_bytes(), 1000 * 1024)
+            del data
+        finally:
+            tracemalloc.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,196 @@
+import unittest
+import base64
+import json
+import sys
+import os
+from unittest.mock import patch, Mock
+from moto import mock_aws
+import boto3
+from botocore.exceptions import ClientError
+
+# テスト用の環境変数設定
+os.environ['ENVIRONMENT'] = 'test'
+os.environ['LOG_LEVEL'] = 'DEBUG'
+os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
+os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
+os.environ['AWS_SECURITY_TOKEN'] = 'testing'
+os.environ['AWS_SESSION_TOKEN'] = 'testing'
+os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
+
+# テスト対象モジュールをインポート
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'notification'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'layers', 'common', 'python'))
+
+import notification
+from notification import lambda_handler
+from db import BatchWriteError
+
+
+def index(name, partition_key):
+    """GSIの定義を作成"""
+    return {
+        'IndexName': name,
+        'KeySchema': [
+            {'AttributeName': partition_key, 'KeyType': 'HASH'},
+            {'AttributeName': 'created_at', 'KeyType': 'RANGE'}
+        ],
+        'Projection': {'ProjectionType': 'ALL'}
+    }
+
+
+@mock_aws
+class TestNotification(unittest.TestCase):
+    """通知機能のテストクラス"""
+
+    def setUp(self):
+        """テスト前の準備"""
+        dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+        self.table = dynamodb.create_table(
+            TableName='test-notifications',
+            KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[
+                {'AttributeName': 'id', 'AttributeType': 'S'},
+                {'AttributeName': 'status', 'AttributeType': 'S'},
+                {'AttributeName': 'recipient', 'AttributeType': 'S'},
+                {'AttributeName': 'created_at', 'AttributeType': 'S'}
+            ],
+            GlobalSecondaryIndexes=[
+                index('status-created_at-index', 'status'),
+                index('recipient-created_at-index', 'recipient')
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        boto3.client('ses', region_name='us-east-1').verify_email_identity(
+            EmailAddress='noreply@test.example.com'
+        )
+
+        self.context = Mock()
+        self.context.request_id = 'test-request-id'
+        self.context.function_name = 'test-notification'
+
+    def test_send_email_records_notification(self):
+        """メール送信と通知記録のテスト"""
+        event = {
+            'httpMethod': 'POST',
+            'resource': '/notify',
+            'body': json.dumps({
+                'recipient': 'user@example.com',
+                'subject': 'Hello',
+                'message': 'Test message',
+                'channel': 'email'
+            })
+        }
+
+        response = lambda_handler(event, self.context)
+
+        self.assertEqual(response['statusCode'], 200)
+        item = self.table.get_item(Key={'id': 'test-request-id'})['Item']
+        self.assertEqual(item['status'], 'sent')
+        # 保持期間のTTLが付与される
+        self.assertGreater(item['expires_at'], 0)
+
+    def test_send_missing_fields(self):
+        """必須フィールドが欠けている場合のテスト"""
+        event = {'httpMethod': 'POST', 'resource': '/notify', 'body': json.dumps({'recipient': 'a@example.com'})}
+
+        response = lambda_handler(event, self.context)
+
+        self.assertEqual(response['statusCode'], 400)
+        self.assertIn('Missing required fields', json.loads(response['body'])['error'])
+
+    def test_sns_event_is_recorded_once(self):
+        """SNSイベントの通知が最終状態で記録されることのテスト"""
+        event = {'Records': [{
+            'Sns': {
+                'MessageId': 'message-1',
+                'Message': 'urgent: disk full',
+                'Subject': 'Alert',
+                'TopicArn': 'arn:aws:sns:us-east-1:123456789012:test'
+            }
+        }]}
+
+        lambda_handler(event, self.context)
+
+        item = self.table.get_item(Key={'id': 'message-1'})['Item']
+        self.assertEqual(item['status'], 'processed')
+        self.assertIn('processed_at', item)
+
+    def test_sns_event_fails_when_record_cannot_be_written(self):
+        """通知を記録できない場合にLambdaへ失敗を返すことのテスト"""
+        event = {'Records': [{
+            'Sns': {
+                'MessageId': 'message-1',
+                'Message': 'hello',
+                'TopicArn': 'arn:aws:sns:us-east-1:123456789012:test'
+            }
+        }]}
+        client = notification.audit_writer.client
+
+        with patch.object(client, 'batch_write_item', side_effect=ClientError(
+                {'Error': {'Code': 'InternalServerError', 'Message': 'boom'}}, 'BatchWriteItem')):
+            with self.assertRaises(BatchWriteError):
+                lambda_handler(event, self.context)
+
+        self.assertEqual(len(notification.audit_writer), 0)
+
+    def test_list_notifications_by_recipient(self):
+        """宛先での通知検索テスト"""
+        self.table.put_item(Item={'id': 'n1', 'recipient': 'a@example.com', 'status': 'sent',
+                                  'created_at': '2024-07-09T12:00:00Z'})
+        self.table.put_item(Item={'id': 'n2', 'recipient': 'b@example.com', 'status': 'sent',
+                                  'created_at': '2024-07-09T12:01:00Z'})
+
+        event = {
+            'httpMethod': 'GET',
+            'resource': '/notifications',
+            'queryStringParameters': {'recipient': 'a@example.com'}
+        }
+        response = lambda_handler(event, self.context)
+
+        self.assertEqual(response['statusCode'], 200)
+        body = json.loads(response['body'])
+        self.assertEqual([item['id'] for item in body['notifications']], ['n1'])
+        self.assertIsNone(body['next_token'])
+
+    def test_list_notifications_invalid_token(self):
+        """不正なページングトークンのテスト"""
+        event = {
+            'httpMethod': 'GET',
+            'resource': '/notifications',
+            'queryStringParameters': {'status': 'sent', 'next_token': '!!!'}
+        }
+
+        response = lambda_handler(event, self.context)
+
+        self.assertEqual(response['statusCode'], 400)
+
+    def test_list_notifications_rejects_bad_parameters(self):
+        """不正なトークン・件数・時間範囲が400になることのテスト"""
+        not_an_object = base64.urlsafe_b64encode(b'"1"').decode('ascii')
+        wrong_keys = base64.urlsafe_b64encode(b'{"a": "b"}').decode('ascii')
+        index_keys_of_other_index = base64.urlsafe_b64encode(
+            b'{"id": "n1", "recipient": "a@example.com", "created_at": "2024-07-09T12:00:00Z"}'
+        ).decode('ascii')
+        for parameters in (
+            {'next_token': not_an_object},
+            {'next_token': wrong_keys},
+            {'next_token': index_keys_of_other_index},
+            {'limit': '0'},
+            {'limit': '-5'},
+            {'limit': 'ten'},
+            {'last_minutes': '-60'},
+            {'last_minutes': str(10 ** 12)}
+        ):
+            event = {
+                'httpMethod': 'GET',
+                'resource': '/notifications',
+                'queryStringParameters': {'status': 'sent', **parameters}
+            }
+
+            response = lambda_handler(event, self.context)
+
+            self.assertEqual(response['statusCode'], 400, parameters)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import unittest
+import sys
+import os
+import json
+import random
+import threading
+import time
+
+# テスト対象モジュールをインポート
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'tools'))
+
+from replay import build_report, detect_function, percentile, route_key, run, synthesize
+
+EVENTS_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'events')
+
+
+def load_event(name):
+    with open(os.path.join(EVENTS_DIR, name)) as event_file:
+        return json.load(event_file)
+
+
+class TestReplay(unittest.TestCase):
+    """負荷試験ツールのテストクラス"""
+
+    def test_detect_function(self):
+        """イベントの形から送信先の関数を判定できることのテスト"""
+        self.assertEqual(detect_function(load_event('user-create.json')), 'user_management')
+        self.assertEqual(detect_function(load_event('s3-event.json')), 'data_processor')
+        self.assertEqual(detect_function(load_event('notification-send.json')), 'notification')
+        self.assertIsNone(detect_function(load_event('warmup.json')))
+
+    def test_synthesize_unique_ids(self):
+        """合成したイベントのIDとメールアドレスが一意になることのテスト"""
+        rng = random.Random(1)
+        template = load_event('user-create.json')
+
+        first = synthesize(template, rng)
+        second = synthesize(template, rng)
+
+        self.assertNotEqual(first['requestContext']['requestId'], second['requestContext']['requestId'])
+        self.assertNotEqual(json.loads(first['body'])['email'], json.loads(second['body'])['email'])
+        # テンプレート自体は変更しない
+        self.assertEqual(template, load_event('user-create.json'))
+
+    def test_synthesize_batch_and_payload(self):
+        """バッチサイズとペイロードサイズを変えたレコードを作成できることのテスト"""
+        event = synthesize(load_event('s3-event.json'), random.Random(1), payload_size=2048, batch_size=5)
+
+        self.assertEqual(len(event['Records']), 5)
+        self.assertEqual(len({record['s3']['object']['key'] for record in event['Records']}), 5)
+        self.assertTrue(all(record['s3']['object']['size'] == 2048 for record in event['Records']))
+        self.assertEqual(route_key(event), 's3 ObjectCreated:Put x5')
+
+    def test_report(self):
+        """ルートごとの件数・エラー数・百分位数を集計できることのテスト"""
+        latencies = [float(value) for value in range(1, 101)]
+        self.assertEqual(percentile(latencies, 0.5), 50.0)
+        self.assertEqual(percentile(latencies, 0.99), 99.0)
+
+        report = build_report({'route': latencies}, {'route': 2}, 2.0)
+
+        self.assertEqual(report['total'], 100)
+        self.assertEqual(report['errors'], 2)
+        self.assertEqual(report['throughput_rps'], 50.0)
+        self.assertEqual(report['routes']['route']['max_ms'], 100.0)
+
+
+class SlowTarget:
+    """呼び出しに一定時間かかる実行先（関数ごとに直列）"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.locks = {'serial': threading.Lock()}
+        self.counter_lock = threading.Lock()
+        self.completed = 0
+
+    def slot(self, function):
+        return self.locks.get(function) or threading.Lock()
+
+    def invoke(self, function, event):
+        time.sleep(self.seconds)
+        with self.counter_lock:
+            self.completed += 1
+        return {'statusCode': 200}
+
+
+class TestReplayRun(unittest.TestCase):
+    """ワークロード実行と計測のテストクラス"""
+
+    def test_latency_excludes_container_wait_without_rate(self):
+        """レート未指定時はコンテナの空き待ちをレイテンシに含めないことのテスト"""
+        target = SlowTarget(0.02)
+        workload = [('serial', {'resource': '/users', 'httpMethod': 'GET'})] * 4
+
+        report = run(target, workload, concurrency=4)
+
+        self.assertLess(report['routes']['serial GET /users']['max_ms'], 60)
+
+    def test_latency_includes_lag_behind_schedule(self):
+        """レート指定時は予定の送信時刻からの遅れもレイテンシに含めることのテスト"""
+        target = SlowTarget(0.05)
+        workload = [('serial', {'resource': '/users', 'httpMethod': 'GET'})] * 4
+
+        report = run(target, workload, rate=100, concurrency=4)
+
+        # 10ms間隔の予定に対して1件50msかかるため、最後のリクエストは約170ms遅れて終わる
+        self.assertGreater(report['routes']['serial GET /users']['max_ms'], 150)
+
+    def test_submitted_requests_are_bounded(self):
+        """投入済みで未完了のリクエストが concurrency 件を超えないことのテスト"""
+        target = SlowTarget(0.01)
+        pending = []
+
+        def workload():
+            for index in range(10):
+                # 次のイベントを取り出す時点で未完了のリクエスト数
+                pending.append(index - target.completed)
+                yield 'parallel', {'resource': '/users', 'httpMethod': 'GET'}
+
+        report = run(target, workload(), concurrency=2)
+
+        self.assertEqual(report['total'], 10)
+        self.assertLessEqual(max(pending), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+import json
+import sys
+import os
+
+# テスト対象モジュールをインポート
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'layers', 'common', 'python'))
+
+from utils import create_response
+from router import Router, cached, require_fields
+
+
+class TestRouter(unittest.TestCase):
+    """Routerのテストクラス"""
+
+    def setUp(self):
+        """テスト前の準備"""
+        self.calls = 0
+        self.router = Router()
+
+        @self.router.route('/users', ['GET', 'POST'])
+        def users(event, context):
+            return create_response(200, {'method': event['httpMethod']})
+
+        @self.router.route('/users/{id}', ['GET'])
+        def user(event, context):
+            return create_response(200, {'id': event['pathParameters']['id']})
+
+        @self.router.route('/users/stats', ['GET'], middleware=[cached(ttl_seconds=60)])
+        def stats(event, context):
+            self.calls += 1
+            return create_response(200, {'calls': self.calls})
+
+        @self.router.route('/items', ['POST'], middleware=[require_fields('name')])
+        def items(event, context):
+            return create_response(201, {})
+
+    def test_dispatch_by_resource(self):
+        """resourceとメソッドでの振り分けテスト"""
+        response = self.router.dispatch({'resource': '/users', 'httpMethod': 'POST'}, None)
+
+        self.assertEqual(json.loads(response['body']), {'method': 'POST'})
+
+    def test_dispatch_by_path(self):
+        """resourceが無いイベントのパス照合テスト"""
+        response = self.router.dispatch({'path': '/users/abc', 'httpMethod': 'GET'}, None)
+        self.assertEqual(json.loads(response['body']), {'id': 'abc'})
+
+        # 固定パスはパスパラメータ付きのルートより優先される
+        response = self.router.dispatch({'path': '/users/stats', 'httpMethod': 'GET'}, None)
+        self.assertIn('calls', json.loads(response['body']))
+
+    def test_method_not_allowed(self):
+        """未登録メソッドの405レスポンステスト"""
+        response = self.router.dispatch({'resource': '/users/{id}', 'httpMethod': 'DELETE'}, None)
+
+        self.assertEqual(response['statusCode'], 405)
+        self.assertEqual(response['headers']['Allow'], 'GET,OPTIONS')
+
+    def test_options(self):
+        """OPTIONSの自動応答テスト"""
+        response = self.router.dispatch({'resource': '/users', 'httpMethod': 'OPTIONS'}, None)
+
+        self.assertEqual(response['statusCode'], 204)
+        self.assertEqual(response['headers']['Access-Control-Allow-Methods'], 'GET,OPTIONS,POST')
+
+    def test_not_found(self):
+        """未登録リソースの404レスポンステスト"""
+        response = self.router.dispatch({'resource': '/unknown', 'httpMethod': 'GET'}, None)
+
+        self.assertEqual(response['statusCode'], 404)
+
+    def test_cached_middleware(self):
+        """キャッシュミドルウェアのテスト"""
+        event = {'resource': '/users/stats', 'httpMethod': 'GET'}
+        self.router.dispatch(event, None)
+
+        response = self.router.dispatch(event, None)
+
+        self.assertEqual(json.loads(response['body']), {'calls': 1})
+        self.assertEqual(response['headers']['X-Cache'], 'HIT')
+
+    def test_require_fields_middleware(self):
+        """必須フィールド検証ミドルウェアのテスト"""
+        response = self.router.dispatch({'resource': '/items', 'httpMethod': 'POST', 'body': '{}'}, None)
+
+        self.assertEqual(response['statusCode'], 400)
+        self.assertIn('name', json.loads(response['body'])['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
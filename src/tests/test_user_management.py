@@ -20,6 +20,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'user_managemen
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'layers', 'common', 'python'))
 
 from user_management import lambda_handler, create_user, get_user, list_users
+from router import clear_response_caches
 
 
 @mock_aws
@@ -40,6 +41,18 @@ class TestUserManagement(unittest.TestCase):
             ],
             BillingMode='PAY_PER_REQUEST'
         )
+        self.stats_table = self.dynamodb.create_table(
+            TableName='test-user-stats',
+            KeySchema=[
+                {'AttributeName': 'id', 'KeyType': 'HASH'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'id', 'AttributeType': 'S'}
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        
+        clear_response_caches()
         
         # テストコンテキストを作成
         self.context = Mock()
@@ -183,6 +196,57 @@ class TestUserManagement(unittest.TestCase):
         self.assertEqual(len(body['users']), 2)
         self.assertEqual(body['count'], 2)
     
+    def test_get_user_stats(self):
+        """ユーザー統計取得のテスト"""
+        self.stats_table.put_item(Item={
+            'id': 'users',
+            'total': 3,
+            'status:active': 2,
+            'status:inactive': 1,
+            'department:Sales': 3
+        })
+        
+        event = {
+            'httpMethod': 'GET',
+            'resource': '/users/stats'
+        }
+        
+        response = lambda_handler(event, self.context)
+        
+        self.assertEqual(response['statusCode'], 200)
+        stats = json.loads(response['body'])['stats']
+        self.assertEqual(stats['total'], 3)
+        self.assertEqual(stats['by_status'], {'active': 2, 'inactive': 1})
+        self.assertEqual(stats['by_department'], {'Sales': 3})
+    
+    def test_get_user_stats_empty(self):
+        """集計前のユーザー統計取得のテスト"""
+        event = {
+            'httpMethod': 'GET',
+            'resource': '/users/stats'
+        }
+        
+        response = lambda_handler(event, self.context)
+        
+        self.assertEqual(response['statusCode'], 200)
+        stats = json.loads(response['body'])['stats']
+        self.assertEqual(stats['total'], 0)
+    
+    def test_warmup_event(self):
+        """ウォームアップイベントのテスト"""
+        response = lambda_handler({'warmup': True}, self.context)
+        
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(response['body']['warmed']['dynamodb:test-users'], 'ok')
+        self.assertEqual(response['body']['warmed']['dynamodb:test-user-stats'], 'ok')
+        self.assertEqual(response['body']['warmed']['preload'], 'ok')
+
+        # 統計のレスポンスはウォームアップ時に作成したキャッシュから返る
+        stats_response = lambda_handler(
+            {'httpMethod': 'GET', 'resource': '/users/stats', 'path': '/users/stats'}, self.context
+        )
+        self.assertEqual(stats_response['headers']['X-Cache'], 'HIT')
+    
     def test_unknown_resource(self):
         """不明なリソースのテスト"""
         event = {
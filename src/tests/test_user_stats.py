@@ -0,0 +1,126 @@
+import unittest
+import sys
+import os
+from unittest.mock import Mock, patch
+from moto import mock_aws
+import boto3
+
+# テスト用の環境変数設定
+os.environ['ENVIRONMENT'] = 'test'
+os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
+os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
+os.environ['AWS_SECURITY_TOKEN'] = 'testing'
+os.environ['AWS_SESSION_TOKEN'] = 'testing'
+os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
+
+# テスト対象モジュールをインポート
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'user_stats'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'layers', 'common', 'python'))
+
+import user_stats
+from user_stats import lambda_handler
+from memory import MemoryBudget
+
+
+def stream_record(event_name, old=None, new=None):
+    """DynamoDB Streamsのレコードを作成"""
+    def image(user):
+        return {key: {'S': value} for key, value in user.items()}
+
+    dynamodb = {}
+    if old:
+        dynamodb['OldImage'] = image(old)
+    if new:
+        dynamodb['NewImage'] = image(new)
+    return {'eventName': event_name, 'dynamodb': dynamodb}
+
+
+@mock_aws
+class TestUserStats(unittest.TestCase):
+    """ユーザー統計集計のテストクラス"""
+
+    def setUp(self):
+        """テスト前の準備"""
+        dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+        self.table = dynamodb.create_table(
+            TableName='test-user-stats',
+            KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        self.context = Mock()
+        self.context.request_id = 'test-request-id'
+
+    def test_aggregates_insert_modify_remove(self):
+        """INSERT / MODIFY / REMOVE の差分集計テスト"""
+        alice = {'id': 'u1', 'status': 'active', 'department': 'Sales'}
+        bob = {'id': 'u2', 'status': 'active', 'department': 'Dev.Ops'}
+        event = {'Records': [
+            stream_record('INSERT', new=alice),
+            stream_record('INSERT', new=bob),
+            stream_record('MODIFY', old=bob, new=dict(bob, status='inactive')),
+        ]}
+
+        lambda_handler(event, self.context)
+        lambda_handler({'Records': [stream_record('REMOVE', old=alice)]}, self.context)
+
+        summary = self.table.get_item(Key={'id': 'users'})['Item']
+        self.assertEqual(summary['total'], 1)
+        self.assertEqual(summary['status:active'], 0)
+        self.assertEqual(summary['status:inactive'], 1)
+        self.assertEqual(summary['department:Sales'], 0)
+        self.assertEqual(summary['department:Dev.Ops'], 1)
+
+    def test_backfill_seeds_existing_users(self):
+        """既存ユーザーから集計を初期化し、以降の差分が正しく反映されることのテスト"""
+        dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+        users_table = dynamodb.create_table(
+            TableName='test-users',
+            KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        alice = {'id': 'u1', 'status': 'active', 'department': 'Sales'}
+        users_table.put_item(Item=alice)
+        users_table.put_item(Item={'id': 'u2', 'status': 'active'})
+        # 誤った値が残っていても置き換えられる
+        self.table.put_item(Item={'id': 'users', 'total': -5, 'status:active': -5})
+
+        lambda_handler({'backfill': True}, self.context)
+        lambda_handler({'Records': [stream_record('MODIFY', old=alice, new=dict(alice, status='inactive'))]},
+                       self.context)
+
+        summary = self.table.get_item(Key={'id': 'users'})['Item']
+        self.assertEqual(summary['total'], 2)
+        self.assertEqual(summary['status:active'], 1)
+        self.assertEqual(summary['status:inactive'], 1)
+        self.assertEqual(summary['department:Sales'], 1)
+        self.assertIn('backfilled_at', summary)
+
+    def test_memory_pressure_reports_remaining_records(self):
+        """メモリ上限に達した場合に処理済みの差分だけを反映し、残りを再試行させることのテスト"""
+        records = []
+        for i in range(5):
+            record = stream_record('INSERT', new={'id': f'u{i}', 'status': 'active'})
+            record['dynamodb']['SequenceNumber'] = f'seq-{i}'
+            records.append(record)
+
+        with patch.object(user_stats, 'memory_budget', MemoryBudget(limit_mb=1, check_every=2)):
+            response = lambda_handler({'Records': records}, self.context)
+
+        self.assertEqual(response['batchItemFailures'], [{'itemIdentifier': 'seq-2'}])
+        summary = self.table.get_item(Key={'id': 'users'})['Item']
+        self.assertEqual(summary['total'], 2)
+
+    def test_no_op_modify_skips_write(self):
+        """集計に影響しない更新では書き込まないことのテスト"""
+        user = {'id': 'u1', 'status': 'active', 'name': 'Before'}
+        event = {'Records': [stream_record('MODIFY', old=user, new=dict(user, name='After'))]}
+
+        lambda_handler(event, self.context)
+
+        self.assertNotIn('Item', self.table.get_item(Key={'id': 'users'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
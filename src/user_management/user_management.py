@@ -11,40 +11,25 @@ from utils import (
 )
 from db import DynamoDBManager
 from validators import validate_user_data
+from warmup import warmup_handler
+from router import Router, timed, cached
 
 
 # 環境変数から設定を取得
 ENVIRONMENT = os.environ.get('ENVIRONMENT', 'dev')
 USER_TABLE_NAME = f"{ENVIRONMENT}-users"
+USER_STATS_TABLE_NAME = f"{ENVIRONMENT}-user-stats"
 
 # DynamoDBマネージャーの初期化
 db_manager = DynamoDBManager(USER_TABLE_NAME)
+stats_db_manager = DynamoDBManager(USER_STATS_TABLE_NAME)
 
+# ルーティングテーブル（import時に一度だけ構築）
+router = Router(middleware=[timed])
 
-def lambda_handler(event, context):
-    """ユーザー管理APIのメインハンドラー"""
-    log_event(event, context)
-
-    try:
-        http_method = event.get('httpMethod', '')
-        resource = event.get('resource', '')
-
-        # ルーティング
-        if resource == '/users' and http_method == 'POST':
-            return create_user(event)
-        elif resource == '/users/{id}' and http_method == 'GET':
-            return get_user(event)
-        elif resource == '/users' and http_method == 'GET':
-            return list_users(event)
-        else:
-            return create_response(404, {'error': 'Resource not found'})
 
-    except Exception as e:
-        print(f"Error in lambda_handler: {str(e)}")
-        return create_response(500, {'error': 'Internal server error'})
-
-
-def create_user(event):
+@router.route('/users', ['POST'])
+def create_user(event, context=None):
     """新規ユーザーを作成"""
     try:
         # リクエストボディをパース
@@ -84,7 +69,8 @@ def create_user(event):
         return create_response(500, {'error': 'Failed to create user'})
 
 
-def get_user(event):
+@router.route('/users/{id}', ['GET'])
+def get_user(event, context=None):
     """IDでユーザーを取得"""
     try:
         user_id = get_path_parameter(event, 'id')
@@ -104,7 +90,8 @@ def get_user(event):
         return create_response(500, {'error': 'Failed to get user'})
 
 
-def list_users(event):
+@router.route('/users', ['GET'])
+def list_users(event, context=None):
     """ユーザー一覧を取得"""
     try:
         # クエリパラメータから取得数を取得
@@ -123,3 +110,52 @@ def list_users(event):
     except Exception as e:
         print(f"Error listing users: {str(e)}")
         return create_response(500, {'error': 'Failed to list users'})
+
+
+# サマリーはストリームで非同期に更新されるため、短時間のキャッシュで十分
+@router.route('/users/stats', ['GET'], middleware=[cached(ttl_seconds=5)])
+def get_user_stats(event, context=None):
+    """ストリームで集計済みのユーザー統計を取得"""
+    try:
+        # サマリーアイテムを1回のGetItemで取得
+        summary = stats_db_manager.get_item({'id': 'users'}) or {}
+
+        stats = {
+            'total': int(summary.get('total', 0)),
+            'by_status': {},
+            'by_department': {},
+            'updated_at': summary.get('updated_at')
+        }
+        for name, value in summary.items():
+            if name.startswith('status:'):
+                stats['by_status'][name[len('status:'):]] = int(value)
+            elif name.startswith('department:'):
+                stats['by_department'][name[len('department:'):]] = int(value)
+
+        return create_response(200, {'stats': stats})
+
+    except Exception as e:
+        print(f"Error getting user stats: {str(e)}")
+        return create_response(500, {'error': 'Failed to get user stats'})
+
+
+def preload_stats():
+    """GET /users/stats のレスポンスキャッシュを事前に作成"""
+    response = router.dispatch({'httpMethod': 'GET', 'resource': '/users/stats', 'path': '/users/stats'}, None)
+    if response['statusCode'] != 200:
+        raise RuntimeError(f"Stats preload returned {response['statusCode']}")
+
+
+# Provisioned Concurrencyの初期化時はデコレーターの適用時にウォームアップするため、
+# preload がルートを使えるようにルート登録の後で定義する
+@warmup_handler(db_managers=[db_manager, stats_db_manager], preload=preload_stats)
+def lambda_handler(event, context):
+    """ユーザー管理APIのメインハンドラー"""
+    log_event(event, context)
+
+    try:
+        return router.dispatch(event, context)
+
+    except Exception as e:
+        print(f"Error in lambda_handler: {str(e)}")
+        return create_response(500, {'error': 'Internal server error'})
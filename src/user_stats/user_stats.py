@@ -0,0 +1,110 @@
+import os
+from collections import Counter
+
+from utils import log_event, get_current_timestamp
+from db import DynamoDBManager, UpdateExpressionBuilder, deserialize_image
+from memory import MemoryBudget, MemoryBudgetExceeded
+
+
+# 環境変数
+ENVIRONMENT = os.environ.get('ENVIRONMENT', 'dev')
+USER_STATS_TABLE_NAME = f"{ENVIRONMENT}-user-stats"
+USERS_TABLE_NAME = f"{ENVIRONMENT}-users"
+
+# 集計結果を保持するサマリーアイテムのキー
+SUMMARY_KEY = {'id': 'users'}
+
+# 集計用の属性名プレフィックス
+STATUS_PREFIX = 'status:'
+DEPARTMENT_PREFIX = 'department:'
+
+db_manager = DynamoDBManager(USER_STATS_TABLE_NAME)
+users_db_manager = DynamoDBManager(USERS_TABLE_NAME)
+
+# バッチ処理中のメモリ使用量を監視
+memory_budget = MemoryBudget()
+
+
+@memory_budget.profile
+def lambda_handler(event, context):
+    """ユーザーテーブルのDynamoDB Streamsを集計するハンドラー
+
+    `{"backfill": true}` で直接呼び出すと、既存ユーザーから集計を作り直す。
+    """
+    log_event(event, context)
+
+    if event.get('backfill'):
+        return backfill()
+
+    records = event.get('Records', [])
+    deltas = Counter()
+    processed = 0
+    try:
+        for record in memory_budget.iterate(records):
+            apply_record(deltas, record)
+            processed += 1
+    except MemoryBudgetExceeded as e:
+        print(f"Stopping batch early: {str(e)}")
+
+    # 差分が0の項目は書き込まない
+    deltas = {name: amount for name, amount in deltas.items() if amount}
+    if deltas:
+        # 処理済みのレコードの差分を1回のアトミック更新で反映
+        builder = UpdateExpressionBuilder()
+        for name, amount in deltas.items():
+            builder.add((name,), amount)
+        builder.set('updated_at', get_current_timestamp())
+        db_manager.update_item(SUMMARY_KEY, builder=builder, return_values='NONE')
+
+    print(f"Applied {processed} stream records, {len(deltas)} counters changed")
+    response = {'statusCode': 200, 'body': 'Stream records processed successfully'}
+    if processed < len(records):
+        # 反映済みのレコードを二重に数えないよう、未処理のレコードだけを再試行させる
+        response['batchItemFailures'] = [
+            {'itemIdentifier': records[processed]['dynamodb']['SequenceNumber']}
+        ]
+    return response
+
+
+def backfill():
+    """ユーザーテーブル全体をスキャンしてサマリーアイテムを初期化
+
+    ストリームは有効化以降の変更しか届かないため、既存のテーブルで集計を
+    始めるときに一度だけ実行する。スキャン中の変更は二重に数えられる
+    可能性があるので、書き込みの少ない時間帯に実行する。
+    """
+    counts = Counter()
+    scanned = 0
+    for user in users_db_manager.scan():
+        for name in counter_names(user):
+            counts[name] += 1
+        scanned += 1
+
+    # 既存のカウンターを置き換える
+    now = get_current_timestamp()
+    db_manager.put_item({**SUMMARY_KEY, **counts, 'total': scanned, 'updated_at': now, 'backfilled_at': now})
+
+    print(f"Backfilled user stats from {scanned} users, {len(counts)} counters")
+    return {'statusCode': 200, 'body': f'Backfilled {scanned} users'}
+
+
+def apply_record(deltas, record):
+    """1件のストリームレコードの差分を集計に加える"""
+    dynamodb = record.get('dynamodb', {})
+    old_image = deserialize_image(dynamodb.get('OldImage'))
+    new_image = deserialize_image(dynamodb.get('NewImage'))
+
+    if old_image is not None:
+        for name in counter_names(old_image):
+            deltas[name] -= 1
+    if new_image is not None:
+        for name in counter_names(new_image):
+            deltas[name] += 1
+
+
+def counter_names(user):
+    """ユーザーが寄与するカウンター属性名の一覧"""
+    names = ['total', f"{STATUS_PREFIX}{user.get('status', 'unknown')}"]
+    if user.get('department'):
+        names.append(f"{DEPARTMENT_PREFIX}{user['department']}")
+    return names
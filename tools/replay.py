@@ -0,0 +1,527 @@
+"""キャプチャしたイベントをハンドラーに再生する負荷試験ツール
+
+NDJSON形式のイベントキャプチャ（1行1イベント、または
+{"function": "...", "event": {...}}）や events/*.json をテンプレートに、
+指定したレート・並列度でハンドラーを呼び出し、ルートごとの
+スループットとレイテンシを集計する。
+
+実行先:
+  local  ハンドラーをプロセス内で直接呼び出す（--moto でAWSをモック、
+         未指定なら AWS_ENDPOINT_URL で localstack-version/ のスタックを使用）
+  rie    localstack-version/docker-compose.yml のLambda RIEコンテナにHTTPで送信
+
+どちらの実行先も関数ごとに1コンテナ相当のため、同じ関数への呼び出しは直列になり、
+--concurrency が効くのは異なる関数の間だけ。レイテンシは、--rate 指定時は予定の
+送信時刻から（待ち時間を含む）、未指定時はコンテナが空いて呼び出しを始めた時刻から測る。
+
+例:
+  python tools/replay.py --moto --count 500 --concurrency 4
+  python tools/replay.py --capture captures.ndjson --rate 50 --duration 60 --target rie
+"""
+import argparse
+import contextlib
+import copy
+import glob
+import io
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, 'src')
+
+# 関数名 -> ハンドラーモジュール
+FUNCTIONS = ['user_management', 'data_processor', 'notification', 'health_check']
+
+# docker-compose.yml のRIEコンテナ
+RIE_ENDPOINTS = {
+    'user_management': 'http://localhost:9001',
+    'data_processor': 'http://localhost:9002',
+    'notification': 'http://localhost:9003',
+    'health_check': 'http://localhost:9004'
+}
+
+# localstack-version/ のスタック
+LOCALSTACK_ENDPOINT = 'http://localhost:4566'
+LOCALSTACK_BUCKET_NAME = 'lambda-cicd-local-data'
+
+# APIのパスの先頭 -> 関数名
+ROUTE_PREFIXES = [
+    ('/users', 'user_management'),
+    ('/process', 'data_processor'),
+    ('/uploads', 'data_processor'),
+    ('/jobs', 'data_processor'),
+    ('/notify', 'notification'),
+    ('/notifications', 'notification'),
+    ('/health', 'health_check')
+]
+
+
+# ---------------------------------------------------------------------------
+# イベントの読み込みと合成
+# ---------------------------------------------------------------------------
+
+def load_events(captures, templates):
+    """キャプチャとテンプレートから (関数名, イベント) の一覧を読み込む"""
+    entries = []
+    for path in captures:
+        with open(path) as capture:
+            for line in capture:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                if 'event' in record:
+                    entries.append((record.get('function') or detect_function(record['event']), record['event']))
+                else:
+                    entries.append((detect_function(record), record))
+
+    for pattern in templates:
+        for path in sorted(glob.glob(pattern)):
+            with open(path) as template:
+                event = json.load(template)
+            function = detect_function(event)
+            if function:
+                entries.append((function, event))
+
+    return [(function, event) for function, event in entries if function]
+
+
+def detect_function(event):
+    """イベントの形から送信先の関数を判定"""
+    records = event.get('Records') or []
+    if records:
+        source = records[0].get('eventSource') or records[0].get('EventSource')
+        if source == 'aws:s3' or 's3' in records[0]:
+            return 'data_processor'
+        if source == 'aws:sns' or 'Sns' in records[0]:
+            return 'notification'
+        return None
+
+    path = event.get('resource') or event.get('path') or ''
+    for prefix, function in ROUTE_PREFIXES:
+        if path.startswith(prefix):
+            return function
+    return None
+
+
+def route_key(event):
+    """レポートで集計するルート名"""
+    records = event.get('Records') or []
+    if records:
+        if 's3' in records[0]:
+            return f"s3 {records[0].get('eventName', 'ObjectCreated')} x{len(records)}"
+        return f"sns x{len(records)}"
+    return f"{event.get('httpMethod', '?')} {event.get('resource') or event.get('path')}"
+
+
+def synthesize(event, rng, unique_ids=True, payload_size=None, batch_size=None):
+    """テンプレートからバリエーションを持つイベントを作成"""
+    event = copy.deepcopy(event)
+
+    if event.get('Records'):
+        template = event['Records'][0]
+        count = batch_size or len(event['Records'])
+        event['Records'] = [
+            synthesize_record(template, rng, unique_ids, payload_size) for _ in range(count)
+        ]
+        return event
+
+    if unique_ids:
+        request_context = event.setdefault('requestContext', {})
+        request_context['requestId'] = str(uuid.UUID(int=rng.getrandbits(128)))
+
+    body = event.get('body')
+    if isinstance(body, str) and body:
+        try:
+            data = json.loads(body)
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            if unique_ids:
+                for field in ('email', 'recipient'):
+                    if isinstance(data.get(field), str) and '@' in data[field]:
+                        local, domain = data[field].split('@', 1)
+                        data[field] = f"{local}+{rng.getrandbits(32):08x}@{domain}"
+            if payload_size:
+                for field in ('data', 'message'):
+                    if field in data:
+                        data[field] = 'x' * payload_size
+            event['body'] = json.dumps(data)
+
+    return event
+
+
+def synthesize_record(template, rng, unique_ids, payload_size):
+    """S3 / SNS のレコードを1件作成"""
+    record = copy.deepcopy(template)
+    suffix = f"{rng.getrandbits(64):016x}"
+
+    if 's3' in record:
+        s3_object = record['s3']['object']
+        if unique_ids:
+            directory, _, name = s3_object['key'].rpartition('/')
+            s3_object['key'] = f"{directory}/{suffix}-{name}" if directory else f"{suffix}-{name}"
+        if payload_size:
+            s3_object['size'] = payload_size
+    elif 'Sns' in record:
+        if unique_ids:
+            record['Sns']['MessageId'] = str(uuid.UUID(int=rng.getrandbits(128)))
+        if payload_size:
+            record['Sns']['Message'] = 'x' * payload_size
+
+    return record
+
+
+# ---------------------------------------------------------------------------
+# 実行先
+# ---------------------------------------------------------------------------
+
+class ReplayContext:
+    """Lambdaのcontextの代わりになる最小限のオブジェクト"""
+
+    def __init__(self, function_name, request_id):
+        self.function_name = function_name
+        self.aws_request_id = request_id
+        self.request_id = request_id
+        self.memory_limit_in_mb = 512
+
+    def get_remaining_time_in_millis(self):
+        return 30000
+
+
+class LocalTarget:
+    """ハンドラーをプロセス内で直接呼び出す実行先
+
+    Lambdaの1コンテナは同時に1リクエストしか処理しないため、関数ごとの
+    slot() で呼び出しを直列にし、並列度は異なる関数間でのみ効く。
+    """
+
+    def __init__(self, functions):
+        self.handlers = {}
+        self.locks = {}
+        for function in functions:
+            self.handlers[function] = load_handler(function)
+            self.locks[function] = threading.Lock()
+
+    def slot(self, function):
+        """関数のコンテナが空くまで待つ（呼び出し側はこの中で invoke する）"""
+        return self.locks[function]
+
+    def invoke(self, function, event):
+        request_id = (event.get('requestContext') or {}).get('requestId') or str(uuid.uuid4())
+        return self.handlers[function](event, ReplayContext(function, request_id))
+
+
+class RieTarget:
+    """Lambda Runtime Interface EmulatorにHTTPで送信する実行先
+
+    RIEのコンテナも同時に1リクエストしか処理しないため、関数ごとに直列にする。
+    """
+
+    def __init__(self, endpoints):
+        self.endpoints = endpoints
+        self.locks = {function: threading.Lock() for function in endpoints}
+
+    def slot(self, function):
+        """関数のコンテナが空くまで待つ（呼び出し側はこの中で invoke する）"""
+        return self.locks[function]
+
+    def invoke(self, function, event):
+        request = urllib.request.Request(
+            f"{self.endpoints[function]}/2015-03-31/functions/function/invocations",
+            data=json.dumps(event).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        with urllib.request.urlopen(request, timeout=60) as response:  # nosec B310 - ローカルのRIEのみ
+            return json.loads(response.read() or b'null')
+
+
+def load_handler(function):
+    """ハンドラーモジュールを読み込む"""
+    sys.path.insert(0, os.path.join(SRC_DIR, function))
+    layer_dir = os.path.join(SRC_DIR, 'layers', 'common', 'python')
+    if layer_dir not in sys.path:
+        sys.path.insert(0, layer_dir)
+    module = __import__(function)
+    return module.lambda_handler
+
+
+def setup_moto(environment, bucket_name):
+    """motoでテーブル・バケット・SESの送信元を作成"""
+    from moto import mock_aws
+    import boto3
+
+    mock = mock_aws()
+    mock.start()
+
+    dynamodb = boto3.client('dynamodb')
+
+    def create_table(name, indexes=()):
+        attributes = {'id'} | {attribute for index in indexes for attribute in (index[1], 'created_at')}
+        params = {
+            'TableName': f"{environment}-{name}",
+            'KeySchema': [{'AttributeName': 'id', 'KeyType': 'HASH'}],
+            'AttributeDefinitions': [{'AttributeName': name, 'AttributeType': 'S'} for name in sorted(attributes)],
+            'BillingMode': 'PAY_PER_REQUEST'
+        }
+        if indexes:
+            params['GlobalSecondaryIndexes'] = [
+                {
+                    'IndexName': index_name,
+                    'KeySchema': [
+                        {'AttributeName': partition_key, 'KeyType': 'HASH'},
+                        {'AttributeName': 'created_at', 'KeyType': 'RANGE'}
+                    ],
+                    'Projection': {'ProjectionType': 'ALL'}
+                }
+                for index_name, partition_key in indexes
+            ]
+        dynamodb.create_table(**params)
+
+    create_table('users')
+    create_table('user-stats')
+    create_table('processed-data', [('status-created_at-index', 'status')])
+    create_table('notifications', [
+        ('status-created_at-index', 'status'),
+        ('recipient-created_at-index', 'recipient')
+    ])
+    boto3.client('s3').create_bucket(Bucket=bucket_name)
+    boto3.client('ses').verify_domain_identity(Domain=f"{environment}.example.com")
+
+    return mock
+
+
+def prepare_s3_objects(event, bucket_name, s3):
+    """S3イベントが参照するオブジェクトを作成"""
+    for record in event.get('Records') or []:
+        if 's3' in record:
+            record['s3']['bucket']['name'] = bucket_name
+            s3_object = record['s3']['object']
+            s3.put_object(Bucket=bucket_name, Key=s3_object['key'], Body=b'x' * int(s3_object.get('size') or 0))
+
+
+# ---------------------------------------------------------------------------
+# 実行と集計
+# ---------------------------------------------------------------------------
+
+def is_error(response):
+    """レスポンスがエラーかどうか"""
+    if not isinstance(response, dict):
+        return False
+    if response.get('errorMessage'):
+        return True
+    status_code = response.get('statusCode')
+    return isinstance(status_code, int) and status_code >= 500
+
+
+def percentile(values, ratio):
+    """ソート済みの値から百分位数を取得（最近傍法）"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, math.ceil(ratio * len(values)) - 1))
+    return values[index]
+
+
+def run(target, workload, rate=0.0, concurrency=1, before_invoke=None):
+    """ワークロードを実行し、ルートごとの結果を返す
+
+    同時に処理中のリクエストは concurrency 件まで。rate 指定時のレイテンシは
+    予定の送信時刻から測り、投入やコンテナの空き待ちによる遅れも含める。
+    """
+    results = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    in_flight = threading.BoundedSemaphore(concurrency)
+
+    def invoke(function, event, scheduled):
+        try:
+            if before_invoke:
+                before_invoke(event)
+            with target.slot(function):
+                started = scheduled if scheduled is not None else time.perf_counter()
+                try:
+                    failed = is_error(target.invoke(function, event))
+                except Exception as e:
+                    print(f"Invocation failed: {e}", file=sys.stderr)
+                    failed = True
+                elapsed_ms = (time.perf_counter() - started) * 1000
+            key = f"{function} {route_key(event)}"
+            with lock:
+                results[key].append(elapsed_ms)
+                if failed:
+                    errors[key] += 1
+        finally:
+            in_flight.release()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for index, (function, event) in enumerate(workload):
+            scheduled = None
+            if rate > 0:
+                # 一定間隔で投入する
+                scheduled = started + index / rate
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            # 投入済みのイベントを溜め込まないよう、処理中が concurrency 件に達したら待つ
+            in_flight.acquire()
+            executor.submit(invoke, function, event, scheduled)
+    elapsed = time.perf_counter() - started
+
+    return build_report(results, errors, elapsed)
+
+
+def build_report(results, errors, elapsed):
+    """ルートごとのスループットとレイテンシを集計"""
+    routes = {}
+    for key, latencies in sorted(results.items()):
+        latencies = sorted(latencies)
+        routes[key] = {
+            'count': len(latencies),
+            'errors': errors.get(key, 0),
+            'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+            'p50_ms': round(percentile(latencies, 0.50), 2),
+            'p90_ms': round(percentile(latencies, 0.90), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+            'max_ms': round(latencies[-1], 2)
+        }
+
+    total = sum(route['count'] for route in routes.values())
+    return {
+        'elapsed_s': round(elapsed, 3),
+        'total': total,
+        'errors': sum(route['errors'] for route in routes.values()),
+        'throughput_rps': round(total / elapsed, 2) if elapsed else 0.0,
+        'routes': routes
+    }
+
+
+def format_report(report):
+    """レポートを表形式の文字列にする"""
+    header = f"{'route':<48} {'count':>7} {'errors':>7} {'rps':>9} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}"
+    lines = [header, '-' * len(header)]
+    for key, route in report['routes'].items():
+        lines.append(
+            f"{key:<48} {route['count']:>7} {route['errors']:>7} {route['throughput_rps']:>9.2f} "
+            f"{route['p50_ms']:>9.2f} {route['p90_ms']:>9.2f} {route['p99_ms']:>9.2f} {route['max_ms']:>9.2f}"
+        )
+    lines.append('-' * len(header))
+    lines.append(
+        f"total {report['total']} requests, {report['errors']} errors, "
+        f"{report['throughput_rps']:.2f} req/s in {report['elapsed_s']:.2f}s (latency in ms)"
+    )
+    return '\n'.join(lines)
+
+
+def build_workload(entries, args, rng):
+    """再生するイベントの列を作成"""
+    deadline = time.time() + args.duration if args.duration else None
+    count = 0
+    while True:
+        for function, event in entries:
+            if (args.count and count >= args.count) or (deadline and time.time() >= deadline):
+                return
+            yield function, synthesize(
+                event, rng,
+                unique_ids=not args.keep_ids,
+                payload_size=rng.choice(args.payload_size) if args.payload_size else None,
+                batch_size=rng.choice(args.batch_size) if args.batch_size else None
+            )
+            count += 1
+        if not args.loop:
+            return
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Replay captured events through the Lambda handlers.')
+    parser.add_argument('--capture', action='append', default=[], help='NDJSON event capture (repeatable)')
+    parser.add_argument('--template', action='append', default=[],
+                        help='event template glob, e.g. "events/*.json" (repeatable)')
+    parser.add_argument('--target', choices=['local', 'rie'], default='local')
+    parser.add_argument('--moto', action='store_true', help='mock AWS in-process (local target only)')
+    parser.add_argument('--endpoint', action='append', default=[],
+                        help='override an RIE endpoint, e.g. user_management=http://localhost:9001')
+    parser.add_argument('--rate', type=float, default=0.0, help='requests per second (0 = unthrottled)')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='requests in flight (calls to the same function still run one at a time)')
+    parser.add_argument('--count', type=int, default=0, help='total requests to send')
+    parser.add_argument('--duration', type=float, default=0.0, help='seconds to keep sending')
+    parser.add_argument('--payload-size', type=int, action='append', default=[],
+                        help='payload bytes for data/message/S3 objects (repeatable, picked at random)')
+    parser.add_argument('--batch-size', type=int, action='append', default=[],
+                        help='records per S3/SNS event (repeatable, picked at random)')
+    parser.add_argument('--keep-ids', action='store_true', help='do not randomise ids')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    parser.add_argument('--verbose', action='store_true', help='show handler output')
+    args = parser.parse_args(argv)
+
+    if not args.capture and not args.template:
+        args.template = [os.path.join(ROOT_DIR, 'events', '*.json')]
+    # 件数か時間の指定があればテンプレートを繰り返す
+    args.loop = bool(args.count or args.duration)
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+
+    entries = load_events(args.capture, args.template)
+    if not entries:
+        print('No replayable events found', file=sys.stderr)
+        return 1
+
+    os.environ.setdefault('ENVIRONMENT', 'local')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    # localstack-version/scripts/init-aws.sh が作成するバケット
+    bucket_name = os.environ.setdefault('DATA_BUCKET_NAME', LOCALSTACK_BUCKET_NAME)
+
+    import boto3
+
+    functions = {function for function, _ in entries}
+    if args.target == 'rie':
+        endpoints = dict(RIE_ENDPOINTS)
+        endpoints.update(dict(endpoint.split('=', 1) for endpoint in args.endpoint))
+        target = RieTarget(endpoints)
+        # RIEコンテナと同じlocalstackにS3イベント用のオブジェクトを置く
+        for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY'):
+            os.environ.setdefault(name, 'test')
+        s3 = boto3.client('s3', endpoint_url=os.environ.get('AWS_ENDPOINT_URL', LOCALSTACK_ENDPOINT))
+    else:
+        if args.moto:
+            for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY'):
+                os.environ.setdefault(name, 'testing')
+            setup_moto(os.environ['ENVIRONMENT'], bucket_name)
+        target = LocalTarget(sorted(functions))
+        s3 = boto3.client('s3')
+    if args.concurrency > len(functions):
+        print(
+            f"Note: calls to the same function run one at a time, so at most {len(functions)} "
+            f"of --concurrency {args.concurrency} requests run in parallel",
+            file=sys.stderr
+        )
+    before_invoke = lambda event: prepare_s3_objects(event, bucket_name, s3)  # noqa: E731
+
+    # ハンドラーのprint出力はレポートと混ざらないよう捨てる
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        report = run(target, build_workload(entries, args, rng), args.rate, args.concurrency, before_invoke)
+
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+    return 1 if report['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())